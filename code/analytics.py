@@ -0,0 +1,315 @@
+"""
+Decision analytics: which choices players make and where they stop.
+
+    python code/analytics.py report analytics/ kiosk2/analytics/ [--jobs N] [--output funnel.json]
+
+While the game runs (see menu.run_menu), every Game session is written to an
+append-only log, one JSON object per line, in DEATHTRIP_ANALYTICS_DIR
+(default "analytics"), one file per kiosk and day: the day each session
+started, so a kiosk running past midnight moves on to a new file with its
+next session. Each event names its session and the milliseconds since the
+session's previous event:
+
+    start     the Game opened at "scene" (a chapter, or the start)
+    scene     "scene" entered
+    line      line number "line" of "scene" was read; "ms" is the time spent on it
+    decision  "choice" taken in "scene", leading to "target"; "ms" is the time at the choices
+    ending    the last line of "scene", an ending or info scene, was read
+    quit      the player left "scene" at line number "line"
+
+The frame loop only puts events on a bounded queue; a background thread
+serializes them and appends them in batches. If the disk falls that far
+behind, new events are dropped (and counted) instead of growing the queue.
+Set DEATHTRIP_ANALYTICS=0 to record nothing.
+
+The report command reads any number of log files from many kiosks, file by
+file and line by line in a pool of worker processes, and adds them up into a
+funnel per branch: how often each scene is entered and left, how often each
+choice is taken and how the sessions that took it ended. Memory use depends
+on the size of the story, not on the amount of logs. A session with no
+ending or quit event (the kiosk lost power) counts as abandoned.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import socket
+import atexit
+import argparse
+import threading
+import multiprocessing
+
+LOG_DIR = os.environ.get("DEATHTRIP_ANALYTICS_DIR", "analytics")
+KIOSK = os.environ.get("DEATHTRIP_KIOSK") or socket.gethostname()
+
+# Events waiting for the writer at most; more are dropped.
+MAX_PENDING = 1000
+# Events written per batch, and the longest (s) an event waits for its batch to fill up.
+BATCH_SIZE = 64
+BATCH_DELAY = 1.0
+
+class SessionLog:
+    """
+    Appends session events to a file from a background thread.
+
+    Does nothing until open() is called, so tools that create Games record nothing.
+    """
+    def __init__(self, max_pending=MAX_PENDING):
+        self.max_pending = max_pending
+        self.path = None        # A fixed file, or None for one file per day in LOG_DIR.
+        self.session = None
+        self.dropped = 0
+        self._queue = None
+        self._thread = None
+        self._mark = 0.0
+        self._day = None        # Writer thread: the day the session being written started.
+
+    def open(self, path=None):
+        """Starts the writer thread; events go to path (default: this kiosk's file for the day of each event)."""
+        if self._thread is not None:
+            return
+        self.path = path
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = threading.Thread(target=self._write_loop, name="analytics-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def start_session(self, scene):
+        """Starts a new session at scene (a story.Scene name)."""
+        if self._queue is None:
+            return
+        self.session = uuid.uuid4().hex[:12]
+        self._mark = time.monotonic()
+        self.event("start", scene=scene)
+        self.event("scene", scene=scene)
+
+    def event(self, kind, **fields):
+        """Queues an event of the current session; never blocks and never touches the disk."""
+        if self._queue is None or self.session is None:
+            return
+        now = time.monotonic()
+        record = {"session": self.session, "t": round(time.time(), 3),
+                  "ms": round((now - self._mark) * 1000), "event": kind}
+        record.update(fields)
+        self._mark = now
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def end_session(self):
+        self.session = None
+
+    def close(self, timeout=2.0):
+        """Writes what is queued and stops the writer thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        self._queue = None
+        self.session = None
+
+    def path_for(self, record):
+        """
+        The file record goes to. A kiosk running past midnight moves on to the
+        next day's file with its next session; a session stays in one file, so
+        the report can follow it.
+        """
+        if self.path is not None:
+            return self.path
+        if record["event"] == "start" or self._day is None:
+            self._day = time.strftime("%Y%m%d", time.localtime(record["t"]))
+        return os.path.join(LOG_DIR, "%s-%s.jsonl" % (KIOSK, self._day))
+
+    def _write_loop(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_DELAY
+            while batch[-1] is not None and len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                batch.pop()
+                running = False
+            if not batch:
+                continue
+            files = {}
+            for record in batch:
+                files.setdefault(self.path_for(record), []).append(record)
+            for path, records in files.items():
+                try:
+                    directory = os.path.dirname(path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+                except OSError as e:
+                    print("Error writing analytics:", e)
+
+log = SessionLog()
+
+# --- Report ---
+def add(total, part):
+    """Adds the numbers in part to total, recursing into dicts."""
+    for key, value in part.items():
+        if isinstance(value, dict):
+            add(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+def finish_session(stats, session, outcome):
+    """Counts a session that ended with outcome ("ending:<scene>", "quit" or "abandoned")."""
+    scene = session["scene"]
+    stats["sessions"]["total"] += 1
+    kind = outcome.partition(":")[0]
+    stats["sessions"][kind] = stats["sessions"].get(kind, 0) + 1
+    if kind == "ending":
+        endings = stats["endings"]
+        endings[scene] = endings.get(scene, 0) + 1
+    else:
+        entry = stats["scenes"].setdefault(scene, {})
+        entry[kind] = entry.get(kind, 0) + 1
+        at_line = entry.setdefault(kind + "_at_line", {})
+        line = str(session["line"])
+        at_line[line] = at_line.get(line, 0) + 1
+    # The funnel: how the sessions that took each branch ended.
+    for branch in dict.fromkeys(session["branches"]):
+        outcomes = stats["branches"][branch].setdefault("outcomes", {})
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+def count_event(stats, sessions, event):
+    """Adds one event to stats; sessions holds the sessions that have not ended yet, by id."""
+    kind = event["event"]
+    session_id = event["session"]
+    if kind == "start":
+        starts = stats["starts"]
+        starts[event["scene"]] = starts.get(event["scene"], 0) + 1
+        sessions[session_id] = {"scene": event["scene"], "line": 0, "branches": []}
+        return
+    session = sessions[session_id]
+    if kind == "scene":
+        session["scene"] = event["scene"]
+        session["line"] = 0
+        entry = stats["scenes"].setdefault(event["scene"], {})
+        entry["entered"] = entry.get("entered", 0) + 1
+    elif kind == "line":
+        session["line"] = event["line"] + 1
+        entry = stats["scenes"].setdefault(event["scene"], {})
+        line_ms = entry.setdefault("line_ms", {}).setdefault(str(event["line"]), {"total": 0, "count": 0})
+        line_ms["total"] += event["ms"]
+        line_ms["count"] += 1
+    elif kind == "decision":
+        branch = event["scene"] + " -> " + event["target"]
+        entry = stats["branches"].setdefault(branch, {})
+        entry["taken"] = entry.get("taken", 0) + 1
+        entry["choice_ms"] = entry.get("choice_ms", 0) + event["ms"]
+        session["branches"].append(branch)
+    elif kind in ("ending", "quit"):
+        session["scene"] = event["scene"]
+        if "line" in event:
+            session["line"] = event["line"]
+        finish_session(stats, sessions.pop(session_id),
+                       "ending:" + event["scene"] if kind == "ending" else "quit")
+
+def summarize_file(path):
+    """Worker: reads one log line by line and returns its counts (see report())."""
+    stats = {"files": 1, "events": 0, "bad_lines": 0,
+             "sessions": {"total": 0}, "starts": {}, "scenes": {}, "branches": {}, "endings": {}}
+    sessions = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for text in f:
+                try:
+                    count_event(stats, sessions, json.loads(text))
+                    stats["events"] += 1
+                except (ValueError, KeyError, TypeError):
+                    # A line cut short by a power loss, or an event of a session whose start is missing.
+                    stats["bad_lines"] += 1
+    except OSError as e:
+        print("Error reading", path, e)
+        stats["unreadable"] = 1
+    for session in sessions.values():
+        finish_session(stats, session, "abandoned")
+    return stats
+
+def log_files(paths):
+    """The .jsonl files among paths, and in the directories among them."""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.endswith(".jsonl"):
+                        yield os.path.join(directory, name)
+        else:
+            yield path
+
+def report(paths, jobs=None):
+    """
+    Adds up every log file under paths in a pool of jobs worker processes.
+
+    :return: Counts per start scene, scene (entered, quit and abandoned, with the
+             line they stopped at, and the time spent per line), branch ("<scene>
+             -> <target>": taken, time at the choices, how those sessions ended)
+             and ending.
+    """
+    total = {}
+    with multiprocessing.Pool(jobs) as pool:
+        for stats in pool.imap_unordered(summarize_file, log_files(paths), chunksize=16):
+            add(total, stats)
+        pool.close()
+        pool.join()
+    return total
+
+def print_funnel(total):
+    sessions = total.get("sessions", {})
+    print("%d sessions from %d files: %d reached an ending, %d quit, %d abandoned" % (
+        sessions.get("total", 0), total.get("files", 0), sessions.get("ending", 0),
+        sessions.get("quit", 0), sessions.get("abandoned", 0)))
+    branches = total.get("branches", {})
+    scenes = total.get("scenes", {})
+    for name, entry in sorted(scenes.items(), key=lambda item: -item[1].get("entered", 0)):
+        entered = entry.get("entered", 0)
+        left = entry.get("quit", 0) + entry.get("abandoned", 0)
+        print("%-20s entered %6d  stopped %6d (%.0f%%)" % (name, entered, left, 100 * left / max(1, entered)))
+        for branch, stats in sorted(branches.items()):
+            if branch.startswith(name + " -> "):
+                outcomes = ", ".join("%s %d" % (outcome, count) for outcome, count in
+                                     sorted(stats.get("outcomes", {}).items(), key=lambda item: -item[1]))
+                print("    -> %-16s %6d (%.0f%%)  %s" % (branch.split(" -> ")[1], stats["taken"],
+                                                      100 * stats["taken"] / max(1, entered), outcomes))
+    for name, count in sorted(total.get("endings", {}).items(), key=lambda item: -item[1]):
+        print("ending %-20s %6d" % (name, count))
+    if total.get("bad_lines"):
+        print("warning: %d unreadable lines" % total["bad_lines"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Add up Deathtrip decision logs into funnel statistics.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_parser = commands.add_parser("report", help="aggregate log files")
+    report_parser.add_argument("paths", nargs="+", help="log files, or directories to search for *.jsonl")
+    report_parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    report_parser.add_argument("--output", help="write the statistics here as JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    total = report(args.paths, args.jobs)
+    print_funnel(total)
+    print("%d files, %d events in %.1f s" % (total.get("files", 0), total.get("events", 0),
+                                             time.perf_counter() - started))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(total, f, indent=1)
+    sys.exit(1 if total.get("unreadable") else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+import sys
+import os
+import json
+import mmap
+import zlib
+import time
+import queue
+import threading
+from collections import OrderedDict
+import pygame
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, relative_path)
+
+# Process-wide surface cache shared by game.py, menu.py and settings.py.
+# Keys are (relative path, target size, convert mode, smooth) and values are the
+# decoded (and scaled) surfaces themselves, so every caller gets the same object
+# and entries stay alive between game sessions. The order is least recently
+# used first, so trim() knows what to evict.
+_surface_cache = OrderedDict()
+
+def budget_from_env(name, default=None):
+    """
+    Reads a budget in megabytes from the environment variable name.
+
+    :return: Bytes, or None for no limit: the variable (and default) unset, "0" or "none".
+    """
+    value = os.environ.get(name) or default
+    if value is None or value.strip().lower() in ("0", "none"):
+        return None
+    try:
+        megabytes = float(value)
+    except ValueError:
+        megabytes = -1
+    if not megabytes >= 0:  # Also rejects "nan".
+        raise ValueError('%s must be a number of megabytes, 0 or "none" (no limit), not %r' % (name, value))
+    return int(megabytes * 1024 * 1024)
+
+# Bytes of cached images to keep before trim() starts evicting (None: no limit).
+memory_budget = budget_from_env("DEATHTRIP_IMAGE_BUDGET_MB", "32")
+
+# Who first loaded each cache entry ("menu", "settings", "game", ...), for the
+# memory report (see memory.py). Entries loaded without an owner are "shared".
+_owners = {}
+
+# Keys looked up since the last new_frame() (see memory.py). Evicting those
+# would only make the frame that draws them load them again.
+_frame_keys = set()
+
+# Cache keys pinned by whoever keeps their surface between frames (a button's
+# skin and label, Game's logo, the typewriter's rows), with how many holders
+# each has. trim() and fonts.clear_rendered() leave them alone: the holder keeps
+# the pixels alive, so evicting them would free nothing. The rendered text
+# cache (fonts.py) shares this table; its keys never look like image keys.
+_held = {}
+
+def new_frame():
+    _frame_keys.clear()
+
+def frame_keys():
+    """Keys looked up since the last new_frame(), as a new set."""
+    return set(_frame_keys)
+
+def hold(key):
+    """Pins a cache key until release(key); call it once per holder."""
+    _held[key] = _held.get(key, 0) + 1
+
+def release(key):
+    count = _held.get(key, 0) - 1
+    if count > 0:
+        _held[key] = count
+    else:
+        _held.pop(key, None)
+
+def is_held(key):
+    return key in _held
+
+def image_key(relative_path, size=None, alpha=False, smooth=False):
+    """The cache key load_image() uses for these arguments, e.g. to hold() it."""
+    return (relative_path, tuple(size) if size is not None else None,
+            "convert_alpha" if alpha else "convert", smooth)
+
+def owner_of(key):
+    return _owners.get(key) or "shared"
+
+def _store(key, surface, owner):
+    _surface_cache[key] = surface
+    if owner is not None:
+        _owners.setdefault(key, owner)
+
+# Number of surfaces created by the asset cache and the UI widgets. Tools can
+# compare it before and after a frame to check that warm screens allocate nothing.
+allocation_count = 0
+
+def note_allocation(count=1):
+    global allocation_count
+    allocation_count += count
+
+# Native (width, height) of every image decoded so far, so aspect-ratio based
+# sizes can be resolved without decoding the file again.
+_native_sizes = {}
+
+def _decode(relative_path, mode):
+    image = pygame.image.load(resource_path(relative_path))
+    _native_sizes[relative_path] = image.get_size()
+    note_allocation()
+    return image.convert_alpha() if mode == "convert_alpha" else image.convert()
+
+def load_image(relative_path, size=None, alpha=False, smooth=False, owner=None):
+    """
+    Returns the shared surface for an image, decoding and scaling it only once.
+
+    :param relative_path: Path relative to the game folder, e.g. "images/chapter1.jpg".
+    :param size: Target (width, height), or None to keep the native size.
+    :param alpha: Use convert_alpha() instead of convert().
+    :param smooth: Use smoothscale instead of scale when resizing.
+    :param owner: Who the image is loaded for, for the memory report.
+    """
+    key = image_key(relative_path, size, alpha, smooth)
+    relative_path, size, mode, smooth = key
+    surface = _surface_cache.get(key)
+    if surface is None:
+        surface = _load_from_pack(key)
+        if surface is None:
+            surface = _scale(_decode(relative_path, mode), size, smooth)
+        _store(key, surface, owner)
+    else:
+        _surface_cache.move_to_end(key)
+    _frame_keys.add(key)
+    return surface
+
+def _scale(surface, size, smooth):
+    if size is None or surface.get_size() == size:
+        return surface
+    scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+    note_allocation()
+    return scale(surface, size)
+
+def _load_sized(relative_path, size_for, alpha, smooth, owner):
+    _open_pack()  # The pack knows the native sizes of its sources.
+    native = _native_sizes.get(relative_path)
+    if native is not None:
+        return load_image(relative_path, size_for(native), alpha=alpha, smooth=smooth, owner=owner)
+    # First time we see this file: decode once and derive the size from it.
+    mode = "convert_alpha" if alpha else "convert"
+    image = _decode(relative_path, mode)
+    size = size_for(image.get_size())
+    key = (relative_path, size, mode, smooth)
+    if key not in _surface_cache:
+        _store(key, _scale(image, size, smooth), owner)
+    _frame_keys.add(key)
+    return _surface_cache[key]
+
+def size_for_width(width):
+    """Size rule for a fixed width that keeps the aspect ratio (see load_image_width and LoadJob)."""
+    def size_for(native):
+        native_width, native_height = native
+        return (width, int(native_height * (width / native_width)))
+    return size_for
+
+def size_for_fit(box_size):
+    """Size rule that fits inside box_size and keeps the aspect ratio (see load_image_fit and LoadJob)."""
+    def size_for(native):
+        scale_factor = min(box_size[0] / native[0], box_size[1] / native[1])
+        return (int(native[0] * scale_factor), int(native[1] * scale_factor))
+    return size_for
+
+def load_image_width(relative_path, width, alpha=False, smooth=False, owner=None):
+    """Loads an image scaled to a fixed width, keeping its aspect ratio."""
+    return _load_sized(relative_path, size_for_width(width), alpha, smooth, owner)
+
+def load_image_fit(relative_path, box_size, alpha=False, smooth=False, owner=None):
+    """Loads an image scaled to fit inside box_size, keeping its aspect ratio."""
+    return _load_sized(relative_path, size_for_fit(box_size), alpha, smooth, owner)
+
+def cached_surface(key, build, owner=None):
+    """
+    Returns a shared surface that is derived from other assets (e.g. a composited logo).
+
+    :param key: Any hashable key identifying the surface.
+    :param build: Called without arguments to create the surface on a cache miss.
+    """
+    surface = _surface_cache.get(key)
+    if surface is None:
+        surface = build()
+        note_allocation()
+        _store(key, surface, owner)
+    _frame_keys.add(key)
+    return surface
+
+def clear():
+    """Empties the cache, e.g. when the window is resized and every image is needed at a new size."""
+    _surface_cache.clear()
+    _owners.clear()
+
+def surface_bytes(surface):
+    return surface.get_pitch() * surface.get_height()
+
+def cache_bytes():
+    """Bytes of pixel data held by the surface cache."""
+    return sum(surface_bytes(surface) for surface in _surface_cache.values())
+
+def cached_items():
+    """(key, surface) pairs of the surface cache, least recently used first, as a new list."""
+    return list(_surface_cache.items())
+
+def trim(evictable, budget=None, keep=()):
+    """
+    Evicts cached images, least recently used first, until the cache fits the budget.
+    Held images stay (see hold()).
+
+    :param evictable: Relative paths of images that may be evicted (nothing can show them soon),
+                      or None to evict anything, least recently used first.
+    :param budget: Bytes to fit in; defaults to memory_budget.
+    :param keep: Cache keys that stay whatever the budget, e.g. the images of the current frame.
+    :return: Number of surfaces evicted.
+    """
+    budget = memory_budget if budget is None else budget
+    if budget is None:
+        return 0
+    total = cache_bytes()
+    evicted = 0
+    for key in list(_surface_cache):
+        if total <= budget:
+            break
+        if (evictable is None or key[0] in evictable) and key not in keep and key not in _held:
+            total -= surface_bytes(_surface_cache.pop(key))
+            _owners.pop(key, None)
+            evicted += 1
+    return evicted
+
+# --- Pre-baked asset pack ---
+# bake_assets.py writes every image the game loads, already scaled, as raw
+# pixels into one file. load_image() memory-maps it and turns entries into
+# surfaces without decoding or resampling. Entries whose source image changed
+# since the bake are ignored, so a stale pack falls back to the raw images.
+PACK_PATH = "images/assets.pack"
+PACK_MAGIC = b"DTPACK1\n"
+use_pack = os.environ.get("DEATHTRIP_NO_PACK") != "1"
+
+class AssetPack:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        if bytes(self.data[:len(PACK_MAGIC)]) != PACK_MAGIC:
+            raise ValueError("not an asset pack: " + path)
+        index_start = len(PACK_MAGIC) + 4
+        index_length = int.from_bytes(self.data[len(PACK_MAGIC):index_start], "little")
+        index = json.loads(bytes(self.data[index_start:index_start + index_length]))
+        fresh = {path: info for path, info in index["sources"].items() if source_matches(path, info)}
+        self.entries = {}
+        for entry in index["entries"]:
+            if entry["path"] in fresh:
+                size = tuple(entry["size"]) if entry["size"] is not None else None
+                self.entries[(entry["path"], size, entry["mode"], entry["smooth"])] = entry
+        self.native_sizes = {path: tuple(info["native_size"]) for path, info in fresh.items()}
+
+    def read(self, key, copy=False):
+        """
+        Returns an unconverted surface over an entry's pixels, or None if the pack does not have it.
+
+        :param copy: Copy the pixels out of the mapping, so the disk reads happen now
+                     (on the calling thread) instead of when the surface is converted.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        pixels = self.data[entry["offset"]:entry["offset"] + entry["length"]]
+        if copy:
+            pixels = bytes(pixels)
+        return pygame.image.frombuffer(pixels, tuple(entry["pixel_size"]), entry["format"])
+
+    def load(self, key):
+        """Returns a converted surface for a cache key, or None if the pack does not have it."""
+        surface = self.read(key)
+        if surface is None:
+            return None
+        note_allocation()
+        return surface.convert_alpha() if key[2] == "convert_alpha" else surface.convert()
+
+def source_info(relative_path):
+    """Fingerprint of a source image, stored in the pack to detect stale entries."""
+    path = resource_path(relative_path)
+    with open(path, "rb") as f:
+        crc = zlib.crc32(f.read())
+    stat = os.stat(path)
+    return {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns, "crc32": crc}
+
+def source_matches(relative_path, info):
+    try:
+        stat = os.stat(resource_path(relative_path))
+    except OSError:
+        return False
+    if stat.st_size != info["bytes"]:
+        return False
+    if stat.st_mtime_ns == info["mtime_ns"]:
+        return True
+    # Copies (USB sticks, PyInstaller's _MEIPASS) get new mtimes; compare contents.
+    return source_info(relative_path)["crc32"] == info["crc32"]
+
+_pack = None
+
+def _open_pack():
+    global _pack
+    if _pack is None:
+        _pack = False
+        if use_pack:
+            try:
+                _pack = AssetPack(resource_path(PACK_PATH))
+                for path, size in _pack.native_sizes.items():
+                    _native_sizes.setdefault(path, size)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError) as e:
+                print("Error loading asset pack:", e)
+    return _pack
+
+def _load_from_pack(key):
+    pack = _open_pack()
+    return pack.load(key) if pack else None
+
+# --- Background loading ---
+# A LoadJob reads and decodes images on a worker thread while the main loop
+# keeps drawing (e.g. a fade). Only convert()/convert_alpha(), which needs the
+# display, runs on the main thread, in finish().
+def _read_request(request):
+    """
+    Worker-thread half of loading one image.
+
+    :return: (key, surface, native_size, scaled); surface is None if the key is already cached.
+    """
+    relative_path, size, alpha, smooth = request
+    mode = "convert_alpha" if alpha else "convert"
+    native = _native_sizes.get(relative_path)
+    key = None
+    if not callable(size) or native is not None:
+        target = size(native) if callable(size) else size
+        key = (relative_path, tuple(target) if target is not None else None, mode, smooth)
+        if key in _surface_cache:
+            return key, None, native, True
+        surface = _pack.read(key, copy=True) if _pack else None
+        if surface is not None:
+            return key, surface, native, True
+    image = pygame.image.load(resource_path(relative_path))
+    native = image.get_size()
+    if key is None:
+        key = (relative_path, tuple(size(native)), mode, smooth)
+        if key in _surface_cache:
+            return key, None, native, True
+    if key[1] is None or key[1] == native:
+        return key, image, native, True
+    if image.get_bitsize() not in (24, 32):
+        # smoothscale only takes 24/32-bit surfaces; scale after convert() instead.
+        return key, image, native, False
+    scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+    return key, scale(image, key[1]), native, True
+
+class LoadJob:
+    """
+    Loads a batch of images into the shared cache on a worker thread.
+
+    The worker reads, decodes and scales each image (or copies its pixels out of
+    the asset pack); finish() converts the results on the main thread and stores
+    them, so load_image() returns them afterwards without touching the disk.
+    """
+    def __init__(self, requests, on_progress=None, owner=None):
+        """
+        :param requests: (relative_path, size, alpha, smooth) tuples, with the same meaning as
+                         load_image's arguments; size may also be a size rule such as size_for_width(300).
+        :param on_progress: Called from finish() with the fraction done (0.0-1.0) after each image.
+        :param owner: Who the images are loaded for, for the memory report.
+        """
+        self.requests = list(dict.fromkeys(requests))
+        self.on_progress = on_progress
+        self.owner = owner
+        self.finished = 0
+        self.cancelled = False
+        self.results = queue.Queue()
+        _open_pack()  # Open it here so the worker never races to create it.
+        self.thread = threading.Thread(target=self._work, name="asset-loader", daemon=True)
+        self.thread.start()
+
+    def _work(self):
+        for request in self.requests:
+            if self.cancelled:
+                return
+            try:
+                result = _read_request(request)
+            except Exception as e:
+                result = e
+            self.results.put((request, result))
+
+    def progress(self):
+        return self.finished / len(self.requests) if self.requests else 1.0
+
+    def done(self):
+        return self.cancelled or self.finished >= len(self.requests)
+
+    def cancel(self):
+        """Stops loading; images that are not in the cache yet are dropped."""
+        self.cancelled = True
+
+    def finish(self, time_budget=None):
+        """
+        Converts loaded images and puts them in the cache. Call it on the main thread.
+
+        :param time_budget: Milliseconds to spend at most; None waits until every image is loaded.
+        :return: True once the whole batch is in the cache.
+        """
+        start = time.perf_counter()
+        while not self.done():
+            try:
+                request, result = self.results.get(block=time_budget is None)
+            except queue.Empty:
+                break
+            self._store(request, result)
+            self.finished += 1
+            if self.on_progress:
+                self.on_progress(self.progress())
+            if time_budget is not None and (time.perf_counter() - start) * 1000 >= time_budget:
+                break
+        return self.done()
+
+    def _store(self, request, result):
+        if isinstance(result, Exception):
+            # load_image() will raise this again if the image is actually used.
+            print("Error loading image:", request[0], result)
+            return
+        key, surface, native, scaled = result
+        if native is not None:
+            _native_sizes.setdefault(key[0], native)
+        if surface is None or key in _surface_cache:
+            return
+        note_allocation()
+        surface = surface.convert_alpha() if key[2] == "convert_alpha" else surface.convert()
+        if not scaled:
+            surface = _scale(surface, key[1], key[3])
+        _store(key, surface, self.owner)
@@ -0,0 +1,109 @@
+"""
+Bakes every image the game loads into one pre-scaled asset pack.
+
+    python code/bake_assets.py
+
+Loads the menu, chapter select, settings and every Game scene headlessly,
+then writes each surface from the asset cache (at its final display size, as
+raw RGB/RGBA pixels) to images/assets.pack. At runtime assets.load_image
+memory-maps the pack instead of decoding and scaling the JPEG/PNG files.
+Re-run it after changing images; stale entries fall back to the raw files.
+"""
+import os
+import sys
+import json
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import assets
+
+MODES = ("convert", "convert_alpha")
+ALIGNMENT = 16
+
+def collect_surfaces():
+    """Loads and draws every screen once so the asset cache holds everything the game uses."""
+    assets.use_pack = False  # Bake from the source images, never from an old pack.
+    assets.memory_budget = None  # Keep every image until it is written.
+    import menu
+    import settings
+    import game
+
+    screen = game.init()
+    screens = [menu.MenuScene(), menu.ChapterSelectScene(), settings.SettingsScene()]
+    for scene_key in game.STORY.ids:
+        assets.LoadJob(game.asset_requests(scene_key)).finish()
+        g = game.Game(start_scene=scene_key)
+        screens.append(g)
+        # Jump to the end of the dialogue so decision buttons get built too.
+        g.current_line_index = len(g.lines)
+        g.update_scene(0)
+    for scene in screens:
+        scene.draw(screen)
+    settings.SettingsScene().exit()
+    return {key: surface for key, surface in assets.cached_items()
+            if len(key) == 4 and key[2] in MODES}
+
+def bake(output_path):
+    surfaces = collect_surfaces()
+    entries = []
+    blobs = []
+    offset = 0
+    for (path, size, mode, smooth), surface in sorted(surfaces.items(), key=lambda item: repr(item[0])):
+        pixel_format = "RGBA" if mode == "convert_alpha" else "RGB"
+        pixels = pygame.image.tostring(surface, pixel_format)
+        padding = -offset % ALIGNMENT
+        offset += padding
+        blobs.append(b"\0" * padding + pixels)
+        entries.append({
+            "path": path,
+            "size": list(size) if size is not None else None,
+            "mode": mode,
+            "smooth": smooth,
+            "pixel_size": list(surface.get_size()),
+            "format": pixel_format,
+            "offset": offset,  # Relative to the start of the pixel data.
+            "length": len(pixels),
+        })
+        offset += len(pixels)
+
+    sources = {}
+    for path in sorted({entry["path"] for entry in entries}):
+        sources[path] = assets.source_info(path)
+        sources[path]["native_size"] = list(assets._native_sizes[path])
+
+    # Pixel data starts after the header, aligned, so every entry stays aligned.
+    index = {"version": 1, "sources": sources, "entries": entries}
+    header_length = len(assets.PACK_MAGIC) + 4
+    index_bytes = json.dumps(index).encode("utf-8")
+    data_start = header_length + len(index_bytes)
+    data_start += -data_start % ALIGNMENT
+    for entry in entries:
+        entry["offset"] += data_start
+    index_bytes = json.dumps(index).encode("utf-8")
+    # Offsets grew by a few digits; pad the index so data_start still holds.
+    while header_length + len(index_bytes) > data_start:
+        data_start += ALIGNMENT
+        for entry in entries:
+            entry["offset"] += ALIGNMENT
+        index_bytes = json.dumps(index).encode("utf-8")
+    index_bytes += b" " * (data_start - header_length - len(index_bytes))
+
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(assets.PACK_MAGIC)
+        f.write(len(index_bytes).to_bytes(4, "little"))
+        f.write(index_bytes)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, output_path)
+    return len(entries), data_start + offset
+
+def main():
+    output_path = sys.argv[1] if len(sys.argv) > 1 else assets.resource_path(assets.PACK_PATH)
+    count, size = bake(output_path)
+    print(f"Baked {count} images into {output_path} ({size / (1024 * 1024):.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+Headless benchmark for every screen and story scene.
+
+Runs the menu, chapter select, settings screen, every transition and every scene
+in the story script with scripted input under the SDL dummy drivers, and prints
+frame-time percentiles, surfaces allocated per frame and the time to the first
+menu frame as JSON:
+
+    python code/benchmark.py --output bench.json
+    python code/benchmark.py --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+# --- Surface allocation counting ---
+# Installed before the game modules are imported, so every Surface they create
+# through pygame.Surface, pygame.transform, pygame.image or Font.render is counted.
+surface_allocations = 0
+
+def _count(func):
+    def wrapper(*args, **kwargs):
+        global surface_allocations
+        surface_allocations += 1
+        return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+class CountingSurface(pygame.Surface):
+    def __init__(self, *args, **kwargs):
+        global surface_allocations
+        surface_allocations += 1
+        super().__init__(*args, **kwargs)
+
+class CountingFont(pygame.font.Font):
+    def render(self, *args, **kwargs):
+        global surface_allocations
+        surface_allocations += 1
+        return super().render(*args, **kwargs)
+
+def install_counters():
+    pygame.Surface = CountingSurface
+    pygame.font.Font = CountingFont
+    pygame.sysfont.Font = CountingFont
+    for name in ("scale", "smoothscale", "rotate", "rotozoom", "flip", "scale2x"):
+        setattr(pygame.transform, name, _count(getattr(pygame.transform, name)))
+    for name in ("load", "frombuffer", "fromstring", "frombytes"):
+        if hasattr(pygame.image, name):
+            setattr(pygame.image, name, _count(getattr(pygame.image, name)))
+
+from scheduler import FrameScheduler
+from profiling import percentile
+
+class ScriptedScheduler(FrameScheduler):
+    """
+    Feeds scripted events with a fixed time step instead of waiting for input,
+    and records how long each frame took and how many surfaces it allocated.
+    """
+    def __init__(self, script, dt=1000 / 60):
+        """
+        :param script: Called as script(frame, manager); returns the frame's events, or None to stop.
+        :param dt: Time step (ms) handed to the scenes every frame.
+        """
+        super().__init__()
+        self.script = script
+        self.dt = dt
+        self.manager = None
+        self.frame = 0
+        self.frame_times = []
+        self.frame_allocations = []
+        self._frame_start = None
+        self._allocations_start = 0
+
+    def next_frame(self):
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.frame_times.append((now - self._frame_start) * 1000)
+            self.frame_allocations.append(surface_allocations - self._allocations_start)
+        events = self.script(self.frame, self.manager)
+        self.frame += 1
+        if events is None:
+            self.manager.quit()
+            events = []
+        self._frame_start = time.perf_counter()
+        self._allocations_start = surface_allocations
+        return self.dt, events
+
+def summarize(frame_times, frame_allocations):
+    return {
+        "frames": len(frame_times),
+        "frame_ms": {
+            "p50": round(percentile(frame_times, 50), 4),
+            "p90": round(percentile(frame_times, 90), 4),
+            "p99": round(percentile(frame_times, 99), 4),
+            "max": round(max(frame_times, default=0.0), 4),
+            "mean": round(sum(frame_times) / len(frame_times), 4) if frame_times else 0.0,
+        },
+        "surfaces_per_frame": {
+            "mean": round(sum(frame_allocations) / len(frame_allocations), 4) if frame_allocations else 0.0,
+            "max": max(frame_allocations, default=0),
+            "total": sum(frame_allocations),
+        },
+    }
+
+def run_scenes(make_scenes, script, warmup=0):
+    """Runs scenes on a SceneManager with a scripted scheduler; the first warmup frames are not reported."""
+    import menu
+    from scenes import SceneManager
+    scheduler = ScriptedScheduler(script)
+    manager = SceneManager(menu.init(), fade_color=menu.BLACK, scheduler=scheduler)
+    scheduler.manager = manager
+    for scene in make_scenes():
+        manager.push(scene)
+    manager.run()
+    return summarize(scheduler.frame_times[warmup:], scheduler.frame_allocations[warmup:])
+
+# --- Input helpers ---
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+
+def press(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+def release(pos):
+    return pygame.event.Event(pygame.MOUSEBUTTONUP, pos=pos, button=1)
+
+# --- Benchmarks ---
+def bench_menu(frames):
+    import menu
+    start_button = (160, menu.SCREEN_HEIGHT - 205)
+    def script(frame, manager):
+        if frame >= frames:
+            return None
+        # Move the mouse every frame so every frame is drawn, and hold a button
+        # now and then (released off the button, so no action fires).
+        pos = (600 + frame % 200, 300)
+        if frame % 60 == 10:
+            return [press(start_button)]
+        if frame % 60 == 30:
+            return [release(pos)]
+        return [motion(pos)]
+    return run_scenes(lambda: [menu.MenuScene()], script, warmup=1)
+
+def bench_chapter_select(frames):
+    import menu
+    def script(frame, manager):
+        if frame >= frames:
+            return None
+        return [motion((600 + frame % 200, 100))]
+    return run_scenes(lambda: [menu.ChapterSelectScene()], script, warmup=1)
+
+def bench_settings(frames):
+    import settings
+    def script(frame, manager):
+        if frame >= frames:
+            return None
+        slider = manager.top().music_slider
+        y = slider.rect.centery
+        step = frame % 120
+        # Drag the music slider back and forth.
+        if step == 0:
+            return [press((slider.handle_x, y))]
+        if step < 100:
+            x = slider.rect.x + (step * 3) % slider.rect.width
+            return [pygame.event.Event(pygame.MOUSEMOTION, pos=(x, y), rel=(3, 0), buttons=(1, 0, 0))]
+        if step == 100:
+            return [release((slider.handle_x, y))]
+        return [motion((700, 500))]
+    result = run_scenes(lambda: [settings.SettingsScene()], script, warmup=1)
+    import config
+    config.store.flush()
+    return result
+
+def bench_transition(cycles, name="fade", dt=1000 / 60):
+    import menu
+    import transition
+    screen = menu.init()
+    frame_times = []
+    frame_allocations = []
+    for _ in range(cycles):
+        fade = transition.create(name, screen, color=menu.BLACK)
+        while not fade.done:
+            start = time.perf_counter()
+            allocations = surface_allocations
+            screen.blit(menu.background_menu_img(), (0, 0))
+            fade.update(dt)
+            fade.draw()
+            pygame.display.flip()
+            frame_times.append((time.perf_counter() - start) * 1000)
+            frame_allocations.append(surface_allocations - allocations)
+    return summarize(frame_times, frame_allocations)
+
+def bench_story_scene(scene_key, max_frames):
+    import game
+    def script(frame, manager):
+        top = manager.top()
+        if frame >= max_frames or top is None:
+            return None
+        events = [motion((544, 300))]
+        if isinstance(top, game.Game):
+            if top.decision_buttons:
+                return None  # Reached the decision; the next scene is benchmarked on its own.
+            if top.dialogue_finished and frame % 10 == 0:
+                # Auto-advance: click in the middle of the screen.
+                events += [press((544, 300)), release((544, 300))]
+        return events
+    return run_scenes(lambda: [game.Game(start_scene=scene_key)], script, warmup=1)
+
+def measure_startup(runs):
+    """Starts fresh processes and times how long it takes until the first menu frame is on screen."""
+    results = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--first-frame"],
+                                capture_output=True, text=True, check=True).stdout
+        total = (time.perf_counter() - start) * 1000
+        child = json.loads(output.strip().splitlines()[-1])
+        results.append((total, child["import_ms"], child["first_frame_ms"], child["steps"]))
+    # Median of each startup step (see profiling.startup) over the runs.
+    steps = {}
+    for _, _, _, child_steps in results:
+        for step in child_steps:
+            steps.setdefault(step["name"], []).append(step["ms"] or 0.0)
+    return {
+        "runs": runs,
+        "process_to_first_frame_ms": round(percentile([r[0] for r in results], 50), 3),
+        "import_ms": round(percentile([r[1] for r in results], 50), 3),
+        "in_process_first_frame_ms": round(percentile([r[2] for r in results], 50), 3),
+        "steps_ms": {name: round(percentile(times, 50), 3) for name, times in steps.items()},
+    }
+
+def first_frame():
+    # Child process of measure_startup: time the imports and the first menu frame.
+    start = time.perf_counter()
+    import menu
+    imported = time.perf_counter()
+    run_scenes(lambda: [menu.MenuScene()], lambda frame, manager: [] if frame == 0 else None)
+    done = time.perf_counter()
+    from profiling import startup
+    print(json.dumps({"import_ms": (imported - start) * 1000, "first_frame_ms": (done - start) * 1000,
+                      "steps": startup.as_dict()["steps"]}))
+
+def run_all(args):
+    started = time.perf_counter()
+    report = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "startup": measure_startup(args.startup_runs),
+        "screens": {},
+        "scenes": {},
+    }
+    import game
+    report["screens"]["menu"] = bench_menu(args.frames)
+    report["screens"]["chapter_select"] = bench_chapter_select(args.frames)
+    report["screens"]["settings"] = bench_settings(args.frames)
+    import transition
+    for name in transition.TRANSITIONS:
+        key = "transition" if name == "fade" else "transition_" + name
+        report["screens"][key] = bench_transition(args.transition_cycles, name)
+    for scene_key in game.STORY.ids:
+        report["scenes"][scene_key] = bench_story_scene(scene_key, args.frames * 10)
+    report["benchmark_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+def compare(report, baseline, tolerance):
+    """Prints how report differs from baseline; returns True if anything regressed beyond tolerance."""
+    regressed = False
+    for group in ("screens", "scenes"):
+        for name, result in report[group].items():
+            old = baseline.get(group, {}).get(name)
+            if old is None:
+                continue
+            old_p99, new_p99 = old["frame_ms"]["p99"], result["frame_ms"]["p99"]
+            old_allocs, new_allocs = old["surfaces_per_frame"]["mean"], result["surfaces_per_frame"]["mean"]
+            flags = []
+            if old_p99 > 0 and new_p99 > old_p99 * (1 + tolerance):
+                flags.append("p99 frame time")
+            if new_allocs > old_allocs + 0.01:
+                flags.append("surfaces per frame")
+            regressed = regressed or bool(flags)
+            print(f"{group}/{name}: p99 {old_p99:.3f} -> {new_p99:.3f} ms, "
+                  f"surfaces/frame {old_allocs:.2f} -> {new_allocs:.2f}"
+                  + (f"  REGRESSION: {', '.join(flags)}" if flags else ""), file=sys.stderr)
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless performance benchmark for Deathtrip.")
+    parser.add_argument("--frames", type=int, default=300, help="frames per screen benchmark")
+    parser.add_argument("--transition-cycles", type=int, default=5, help="full cycles of each transition to time")
+    parser.add_argument("--startup-runs", type=int, default=3, help="cold starts to time")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative p99 frame time increase when comparing")
+    parser.add_argument("--first-frame", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    install_counters()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    # The settings benchmark moves sliders; keep its config writes away from the real files.
+    os.chdir(tempfile.mkdtemp(prefix="deathtrip-bench-"))
+    if args.first_frame:
+        first_frame()
+        return
+
+    report = run_all(args)
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
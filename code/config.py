@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+import atexit
+
+class ConfigStore:
+    """
+    In-memory settings shared by the menu, the settings screen and the game.
+
+    Values are read from disk once, handed out from memory afterwards and
+    written back debounced and atomically, so neither the frame loop nor a
+    slider drag touches the filesystem on every frame/event. One writer
+    thread, started on the first change, waits for the debounce deadline;
+    later changes only move the deadline.
+    """
+    # Each setting lives in its own one-line "key=value" file, as before.
+    FILES = {
+        "volume": "config.txt",
+        "music_volume": "music_config.txt",
+    }
+    DEFAULTS = {
+        "volume": 1.0,
+        "music_volume": 1.0,
+    }
+
+    def __init__(self, write_delay=0.5):
+        """
+        :param write_delay: Seconds to wait after the last change before writing to disk.
+        """
+        self.write_delay = write_delay
+        self.values = {}
+        self.listeners = {}
+        self.loaded = False
+        self._dirty = set()
+        self._deadline = None   # time.monotonic() at which the pending changes are written.
+        self._thread = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def load(self):
+        """Reads every config file once. Missing files are created with their default."""
+        if self.loaded:
+            return
+        for key, path in self.FILES.items():
+            if os.path.exists(path):
+                try:
+                    with open(path, "r") as f:
+                        line = f.readline().strip()
+                    # No "=" leaves an empty value, which float() rejects too.
+                    value = float(line.partition("=")[2])
+                except (OSError, ValueError):
+                    value = self.DEFAULTS[key]
+                self.values[key] = value
+            else:
+                self.values[key] = self.DEFAULTS[key]
+                self._write(key)
+        self.loaded = True
+
+    def get(self, key):
+        self.load()
+        return self.values[key]
+
+    def set(self, key, value):
+        """Updates a value in memory, notifies subscribers and schedules a write."""
+        self.load()
+        if self.values[key] == value:
+            return
+        self.values[key] = value
+        for callback in list(self.listeners.get(key, [])):
+            callback(value)
+        with self._lock:
+            self._dirty.add(key)
+            if self._deadline is None:
+                self._changed.notify()
+            self._deadline = time.monotonic() + self.write_delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="config-writer", daemon=True)
+                self._thread.start()
+
+    def subscribe(self, key, callback):
+        """Calls callback(value) whenever key changes."""
+        self.listeners.setdefault(key, []).append(callback)
+
+    def unsubscribe(self, key, callback):
+        callbacks = self.listeners.get(key, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    def flush(self):
+        """Writes every pending change to disk right away."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._deadline = None
+        dirty, self._dirty = self._dirty, set()
+        for key in dirty:
+            self._write(key)
+
+    def _write_loop(self):
+        with self._lock:
+            while True:
+                if self._deadline is None:
+                    self._changed.wait()
+                    continue
+                delay = self._deadline - time.monotonic()
+                if delay > 0:
+                    # A change during the wait moves the deadline; look again when it ends.
+                    self._changed.wait(delay)
+                    continue
+                self._flush_locked()
+
+    def _write(self, key):
+        # Write to a temporary file and rename it over the old one, so a crash
+        # mid-write never leaves a truncated config behind.
+        path = self.FILES[key]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(key + "=" + str(self.values[key]))
+        os.replace(tmp_path, path)
+
+store = ConfigStore()
+atexit.register(store.flush)
@@ -0,0 +1,111 @@
+"""
+The game window and the logical resolution.
+
+display.init() starts pygame and opens the one window every screen draws into;
+menu, settings, game and the tools get the screen from it instead of each
+calling pygame.display.set_mode. Importing a game module never opens the
+window or loads anything; that happens when the first screen is created, so
+tools can import the modules headless and without a window.
+
+Screens lay out in logical SCREEN_WIDTH x SCREEN_HEIGHT coordinates and draw
+natively at the window's size: point(), size() and rect() map logical
+coordinates to the window, and images and fonts are loaded at the mapped sizes
+(the asset cache keys them by size, so each resolution gets its own variants,
+made once). The logical area is scaled to fit the window and centered, with
+black bars if the aspect ratio differs. At the default size every mapping is
+the identity. Mouse positions are mapped back to logical coordinates by
+SceneManager, so screens never see window coordinates.
+
+    DEATHTRIP_RESOLUTION=1920x1080   window size (default: the logical size)
+    DEATHTRIP_FULLSCREEN=1           fullscreen at the desktop resolution
+"""
+import os
+import pygame
+from profiling import startup
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 1088, 612
+CAPTION = "Deathtrip"
+
+_screen = None
+
+# Window pixels per logical pixel, and where the logical area is in the window.
+scale = 1.0
+view = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+def window_mode():
+    """The (size, flags) to open the window with, from DEATHTRIP_RESOLUTION and DEATHTRIP_FULLSCREEN."""
+    if os.environ.get("DEATHTRIP_FULLSCREEN") == "1":
+        return (0, 0), pygame.FULLSCREEN
+    resolution = os.environ.get("DEATHTRIP_RESOLUTION")
+    if resolution:
+        width, _, height = resolution.lower().partition("x")
+        return (int(width), int(height)), pygame.RESIZABLE
+    return (SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE
+
+def init():
+    """
+    Starts the pygame subsystems the game uses and opens the window. Only the
+    first call does anything.
+
+    :return: The screen surface.
+    """
+    global _screen
+    if _screen is not None:
+        return _screen
+    with startup.step("display"):
+        pygame.display.init()
+    with startup.step("font"):
+        pygame.font.init()
+    with startup.step("mixer"):
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            # No audio device: the game runs without sound.
+            print("Error starting audio:", e)
+    with startup.step("window"):
+        size, flags = window_mode()
+        _screen = pygame.display.set_mode(size, flags)
+        pygame.display.set_caption(CAPTION)
+        resize()
+    return _screen
+
+def resize():
+    """
+    Fits the logical area to the window's current size. SceneManager calls it
+    when the window is resized; returns True if the mapping changed.
+    """
+    global scale, view
+    width, height = _screen.get_size()
+    new_scale = min(width / SCREEN_WIDTH, height / SCREEN_HEIGHT)
+    new_view = pygame.Rect(0, 0, round(SCREEN_WIDTH * new_scale), round(SCREEN_HEIGHT * new_scale))
+    new_view.center = (width // 2, height // 2)
+    if new_scale == scale and new_view == view:
+        return False
+    scale, view = new_scale, new_view
+    # The bars around the logical area are never drawn over by the screens.
+    _screen.fill((0, 0, 0))
+    return True
+
+def scaled(length):
+    """A logical length in window pixels."""
+    return round(length * scale)
+
+def size(logical_size):
+    return (round(logical_size[0] * scale), round(logical_size[1] * scale))
+
+def point(pos):
+    return (view.x + round(pos[0] * scale), view.y + round(pos[1] * scale))
+
+def rect(logical_rect):
+    """
+    A logical rect in window pixels. Its edges are mapped one by one, so rects
+    that touch in logical coordinates still touch in the window.
+    """
+    logical_rect = pygame.Rect(logical_rect)
+    left, top = point(logical_rect.topleft)
+    right, bottom = point(logical_rect.bottomright)
+    return pygame.Rect(left, top, right - left, bottom - top)
+
+def to_logical(pos):
+    """A window position (e.g. the mouse's) in logical coordinates."""
+    return (int((pos[0] - view.x) / scale), int((pos[1] - view.y) / scale))
@@ -0,0 +1,198 @@
+"""
+Story graph explorer: plays every decision path through the story headlessly.
+
+    python code/explorer.py [--jobs N] [--output-dir explorer_out] [--spike-ms 50]
+
+Every path from the start scene and from each chapter to an ending is listed
+from the compiled story script, then played in a pool of worker processes.
+Dialogue advances on its own and each decision goes through
+Game.handle_decision. For every path it records frame times, the peak surface
+memory (everything memory.usage counts: images, transitions, text and the
+window, also per owner) and a screenshot of the last frame. It writes a JSON report
+and exits with status 1 if a path crashes, ends in the wrong scene or has a
+frame slower than --spike-ms. Endings no path reaches are reported too.
+
+Paths are independent, so the run gets faster with more cores as the script grows.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+import story
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+
+# Fixed time step (ms) the playthroughs run at.
+DT = 1000 / 60
+# Frames to wait after a line has finished typing before clicking on.
+READ_FRAMES = 5
+# A playthrough that has not ended after this many frames is stuck.
+MAX_FRAMES = 20000
+
+def list_paths(graph, start, max_paths=None):
+    """
+    Every decision path from start to a scene without choices.
+
+    :return: Lists of Choices. A path that would enter a scene it already went
+             through stops there instead of looping forever.
+    """
+    paths = []
+    stack = [(start, [], {start})]
+    while stack and (max_paths is None or len(paths) < max_paths):
+        scene_id, path, seen = stack.pop()
+        choices = graph.scenes[scene_id].choices
+        if not choices:
+            paths.append(path)
+            continue
+        for choice in reversed(choices):
+            if choice.target in seen:
+                paths.append(path + [choice])
+            else:
+                stack.append((choice.target, path + [choice], seen | {choice.target}))
+    return paths
+
+def path_name(graph, start, path):
+    return "-".join([graph.scenes[start].name] + [str(graph.scenes[scene_id].choices.index(choice))
+                     for scene_id, choice in zip(path_scene_ids(start, path), path)])
+
+def path_scene_ids(start, path):
+    """The scene each choice of path is made in."""
+    return [start] + [choice.target for choice in path[:-1]]
+
+def init_worker():
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+def play_path(task):
+    """Worker: plays one path and returns its result as a dict."""
+    start_name, targets, name, output_dir = task
+    import pygame
+    import assets
+    import fonts
+    import game
+    import memory
+    from profiling import percentile
+    started = time.perf_counter()
+    result = {"path": name, "start": start_name,
+              "choices": [game.STORY.scenes[target].name for target in targets]}
+    try:
+        # Every path starts with empty caches, as if the game had just been launched.
+        assets.clear()
+        fonts.clear_rendered()
+        game.init()
+        assets.LoadJob(game.asset_requests(start_name), owner="game").finish()
+        g = game.Game(start_scene=start_name)
+        g.enter()
+        frame_times = []
+        peak = memory.usage()
+        next_choice = 0
+        wait = 0
+        while g.running and len(frame_times) < MAX_FRAMES:
+            # Play like a reader: click on a little after each line, and pick the path's next choice.
+            if g.decision_buttons:
+                g.handle_decision(targets[next_choice])
+                next_choice += 1
+            elif g.dialogue_finished:
+                wait += 1
+                if wait >= READ_FRAMES:
+                    wait = 0
+                    g.advance_dialogue()
+            if not g.running:
+                break
+            frame_start = time.perf_counter()
+            g.update(DT)
+            g.render(g.screen)
+            frame_times.append((time.perf_counter() - frame_start) * 1000)
+            held = memory.usage()
+            if held["bytes"] > peak["bytes"]:
+                peak = held
+            # A path ending in a loop stops once it is back in a scene it went through.
+            if next_choice == len(targets) and g.scene.choices and targets:
+                break
+        # The screen still holds the last frame the player saw.
+        screenshot = os.path.join(output_dir, name + ".png")
+        pygame.image.save(g.screen, screenshot)
+        g.exit()
+        result.update({
+            "end": g.scene.name,
+            "ended": not g.running,
+            "frames": len(frame_times),
+            "frame_ms": {
+                "p50": round(percentile(frame_times, 50), 3),
+                "p99": round(percentile(frame_times, 99), 3),
+                "max": round(max(frame_times, default=0.0), 3),
+            },
+            "peak_surface_mb": round(peak["bytes"] / memory.MB, 2),
+            "peak_surface_owners_mb": {owner: round(entry["bytes"] / memory.MB, 2)
+                                       for owner, entry in peak["owners"].items()},
+            "screenshot": screenshot,
+        })
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Play every decision path through the story headlessly.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output-dir", default="explorer_out", help="screenshots and report.json go here")
+    parser.add_argument("--spike-ms", type=float, default=50, help="frames slower than this fail the run")
+    parser.add_argument("--max-paths", type=int, help="stop listing paths after this many")
+    args = parser.parse_args()
+
+    graph = story.load_story(os.path.join(base_path, "data", "story.txt"))
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    starts = list(dict.fromkeys([graph.start] + [scene_id for scene_id, _ in graph.chapters]))
+    tasks = []
+    expected = {}
+    for start in starts:
+        for path in list_paths(graph, start, args.max_paths):
+            name = path_name(graph, start, path)
+            tasks.append((graph.scenes[start].name, [choice.target for choice in path], name, output_dir))
+            expected[name] = graph.scenes[path[-1].target if path else start].name
+
+    started = time.perf_counter()
+    # Spawned workers start clean instead of inheriting this process' state.
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.jobs, initializer=init_worker) as pool:
+        results = sorted(pool.imap_unordered(play_path, tasks), key=lambda result: result["path"])
+        # Let the workers exit on their own: SDL catches the SIGTERM that
+        # terminate() (called when the with block ends) would send them.
+        pool.close()
+        pool.join()
+    wall_seconds = time.perf_counter() - started
+
+    failed = False
+    for result in results:
+        problems = []
+        if "error" in result:
+            problems.append(result["error"])
+        else:
+            if result["end"] != expected[result["path"]]:
+                problems.append(f"ended in {result['end']}, expected {expected[result['path']]}")
+            if result["frame_ms"]["max"] > args.spike_ms:
+                problems.append(f"{result['frame_ms']['max']:.1f} ms frame")
+        result["problems"] = problems
+        failed = failed or bool(problems)
+        summary = "" if "error" in result else (
+            f"-> {result['end']:16} {result['frames']:5} frames, p99 {result['frame_ms']['p99']:.2f} ms, "
+            f"max {result['frame_ms']['max']:.2f} ms, surfaces {result['peak_surface_mb']} MB")
+        print(f"{result['path']:24} {summary}" + (f"  FAIL: {'; '.join(problems)}" if problems else ""))
+
+    endings = [scene.name for scene in graph.scenes if scene.kind != "story"]
+    reached = {result.get("end") for result in results if not result["problems"]}
+    unreached = [name for name in endings if name not in reached]
+    for name in unreached:
+        print("warning: no path reaches", name)
+    print(f"{len(results)} paths with {args.jobs} workers in {wall_seconds:.1f} s")
+
+    with open(os.path.join(output_dir, "report.json"), "w") as f:
+        json.dump({"paths": results, "unreached_endings": unreached,
+                   "workers": args.jobs, "wall_seconds": round(wall_seconds, 3)}, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Shared fonts and text rendering for every screen.
+
+Fonts are opened once (get_font). Whole strings are rendered once and kept in
+an LRU cache (render), so labels, captions and dialogue lines that do not
+change cost a single blit per frame. Text that changes all the time, such as
+slider values, is drawn glyph by glyph from a GlyphAtlas, so a new value only
+costs blits of glyphs that were rendered before.
+"""
+from collections import OrderedDict
+import pygame
+import assets
+
+WHITE = (255, 255, 255)
+
+# How many rendered strings render() keeps.
+CACHE_SIZE = 256
+
+_fonts = {}
+_specs = {}     # Font -> the get_font arguments it was opened with, for scaled().
+_rendered = OrderedDict()
+_atlases = {}
+_advances = {}
+
+def get_font(name=None, size=24, sysfont=False):
+    """
+    Returns the shared Font for name and size, opening it only the first time.
+
+    :param name: Font file (None for pygame's default font), or with sysfont a system font name.
+    :param sysfont: Look name up with pygame.font.SysFont.
+    """
+    key = (name, size, sysfont)
+    font = _fonts.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size) if sysfont else pygame.font.Font(name, size)
+        _fonts[key] = font
+        _specs[font] = key
+    return font
+
+def scaled(font, scale):
+    """
+    The same face as font, opened at its size times scale (see display.scale),
+    so text can be rendered natively at any resolution. font itself at scale 1.
+    """
+    if scale == 1:
+        return font
+    name, size, sysfont = _specs[font]
+    return get_font(name, max(1, round(size * scale)), sysfont)
+
+def render(text, font, color=WHITE):
+    """Returns the antialiased rendering of text, rendering it only on a cache miss."""
+    key = text_key(text, font, color)
+    surface = _rendered.get(key)
+    if surface is None:
+        surface = font.render(text, True, color)
+        assets.note_allocation()
+        _rendered[key] = surface
+        if len(_rendered) > CACHE_SIZE:
+            _rendered.popitem(last=False)
+    else:
+        _rendered.move_to_end(key)
+    return surface
+
+def text_key(text, font, color=WHITE):
+    """The cache key render() uses for these arguments, e.g. to assets.hold() it."""
+    return (text, font, color)
+
+def clear_rendered():
+    """
+    Drops the rendered strings nobody holds (see assets.hold); they are
+    rendered again when next drawn.
+    """
+    for key in list(_rendered):
+        if not assets.is_held(key):
+            del _rendered[key]
+
+def cached_surfaces():
+    """
+    The surfaces of the text caches, for the memory report.
+
+    :return: ("rendered", text, surface) and ("atlas", description, surface) tuples.
+    """
+    found = [("rendered", key[0], surface) for key, surface in _rendered.items()]
+    found += [("atlas", "glyphs %d" % len(glyph_atlas.glyphs), glyph_atlas.surface)
+              for glyph_atlas in _atlases.values()]
+    return found
+
+def advances(font, text):
+    """Returns the advance of every character of text, from glyph metrics cached per font."""
+    table = _advances.setdefault(font, {})
+    missing = "".join(dict.fromkeys(char for char in text if char not in table))
+    if missing:
+        for char, metrics in zip(missing, font.metrics(missing)):
+            table[char] = metrics[4] if metrics else 0
+    return [table[char] for char in text]
+
+class GlyphAtlas:
+    """
+    Every glyph of one font and color that has been drawn so far, packed into
+    rows of a single surface.
+
+    Glyphs are placed by their advances, without kerning, so use it for short
+    text that changes often (numbers) and render() for everything else.
+    """
+    WIDTH = 512
+
+    def __init__(self, font, color=WHITE):
+        self.font = font
+        self.color = color
+        self.ascent = font.get_ascent()
+        self.surface = None
+        self.glyphs = {}    # char -> (area in self.surface, x offset, y offset, advance)
+        self.row_x = 0
+        self.row_y = 0
+        self.row_height = 0
+
+    def glyph(self, char):
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            glyph = self.glyphs[char] = self._add(char)
+        return glyph
+
+    def _add(self, char):
+        image = self.font.render(char, True, self.color)
+        metrics = self.font.metrics(char)[0]
+        minx, _, _, maxy, advance = metrics if metrics else (0, 0, 0, 0, image.get_width())
+        width, height = image.get_size()
+        if self.row_x + width > self.WIDTH:
+            self.row_x = 0
+            self.row_y += self.row_height
+            self.row_height = 0
+        if self.surface is None or self.row_y + height > self.surface.get_height():
+            self._grow(self.row_y + height)
+        # A cleared SRCALPHA surface takes the glyph's pixels unchanged with BLEND_RGBA_MAX.
+        self.surface.blit(image, (self.row_x, self.row_y), special_flags=pygame.BLEND_RGBA_MAX)
+        area = pygame.Rect(self.row_x, self.row_y, width, height)
+        self.row_x += width
+        self.row_height = max(self.row_height, height)
+        # Glyphs taller than the ascent are rendered with extra rows on top;
+        # shift them up so every glyph sits on the same baseline.
+        return area, min(0, minx), self.ascent - max(self.ascent, maxy), advance
+
+    def _grow(self, min_height):
+        height = 64
+        while height < min_height:
+            height *= 2
+        surface = pygame.Surface((self.WIDTH, height), pygame.SRCALPHA)
+        assets.note_allocation()
+        if self.surface is not None:
+            surface.blit(self.surface, (0, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        self.surface = surface
+
+    def width(self, text):
+        return sum(self.glyph(char)[3] for char in text)
+
+    def draw(self, surface, text, pos):
+        """Blits text with its top left at pos; returns the x where the text ends."""
+        x, y = pos
+        for char in text:
+            area, dx, dy, advance = self.glyph(char)
+            surface.blit(self.surface, (x + dx, y + dy), area)
+            x += advance
+        return x
+
+def atlas(font, color=WHITE):
+    """Returns the shared GlyphAtlas for a font and color."""
+    key = (font, color)
+    glyph_atlas = _atlases.get(key)
+    if glyph_atlas is None:
+        glyph_atlas = _atlases[key] = GlyphAtlas(font, color)
+    return glyph_atlas
@@ -1,359 +1,443 @@
 import sys, os
 import pygame
+import assets
+import config
+import widgets
+import fonts
+from scenes import Scene, SceneManager
+from typewriter import Typewriter
+import layout
+import story
+import transition
+import music
+import display
+import analytics
+import savegame
+from profiling import profiler, startup
 
 def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
-pygame.init()
+# Logical screen size; Game lays out in these coordinates (see display.py).
+SCREEN_WIDTH, SCREEN_HEIGHT = display.SCREEN_WIDTH, display.SCREEN_HEIGHT
+
+# The window and the dialogue font; set by init().
+screen = None
+font = None
 
-SCREEN_WIDTH, SCREEN_HEIGHT = 1088, 612
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-if __name__ == "__main__":
-    pygame.display.set_caption("Settings")
-
-def read_config():
-    config_path = "config.txt"
-    if os.path.exists(config_path):
-        with open(config_path, "r") as f:
-            line = f.readline().strip()
-            try:
-                vol = float(line.split("=")[1])
-            except Exception as e:
-                vol = 1.0
-            return vol
-    else:
-        with open(config_path, "w") as f:
-            f.write("volume=1.0")
-        return 1.0
-
-decision_image = pygame.image.load(resource_path("images/button_icon.png")).convert_alpha()
-
-def new_decision_draw(self, screen):
-    scaled_img = pygame.transform.smoothscale(decision_image, (self.rect.width, self.rect.height))
-    screen.blit(scaled_img, (self.rect.x, self.rect.y))
-    text_surf = font.render(self.text, True, WHITE)
-    text_rect = text_surf.get_rect(center=self.rect.center)
-    screen.blit(text_surf, text_rect)
-
-button_box_img = pygame.image.load(resource_path("images/button_box.png")).convert_alpha()
-try:
-    button_click_sound = pygame.mixer.Sound(resource_path(os.path.join("sound", "button_click.wav")))
-    config_volume = read_config()
-    button_click_sound.set_volume(min(config_volume/5.0, 1.0))
-except Exception as e:
-    print("Error loading sound:", e)
-    button_click_sound = None
-
-font = pygame.font.SysFont("Arial", 24)
 WHITE = (255, 255, 255)
 DARK_GRAY = (150, 150, 150)
 
-class AnimatedButton:
-    def __init__(self, text, x, y, width, height, action):
-        self.text = text
-        self.base_rect = pygame.Rect(x, y, width, height)
-        self.rect = self.base_rect.copy()
-        self.action = action
-        self.pressed = False
-        self.press_offset = 5
+DIALOGUE_BOX_RECT = pygame.Rect(20, SCREEN_HEIGHT - 100 - 20, SCREEN_WIDTH - 40, 100)
+# Dialogue text is wrapped to the box minus its 10px padding, and paginated
+# when it does not fit.
+TEXT_RECT = DIALOGUE_BOX_RECT.inflate(-20, -20)
 
-    def draw(self, screen):
-        scaled_img = pygame.transform.scale(button_box_img, (self.rect.width, self.rect.height))
-        screen.blit(scaled_img, (self.rect.x, self.rect.y))
-        text_surf = font.render(self.text, True, WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
-
-    def update(self):
-        if self.pressed:
-            self.rect.y = self.base_rect.y + self.press_offset
-        else:
-            self.rect.y = self.base_rect.y
+# Only the parts of the screen that changed are redrawn and pushed with
+# pygame.display.update(rects). Set DEATHTRIP_FULL_REDRAW=1 to redraw and flip
+# the whole frame every time instead (useful when debugging rendering).
+FULL_REDRAW = os.environ.get("DEATHTRIP_FULL_REDRAW") == "1"
 
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.rect.collidepoint(event.pos):
-                self.pressed = True
-                if button_click_sound:
-                    button_click_sound.play()
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if self.pressed:
-                self.pressed = False
-                if self.rect.collidepoint(event.pos):
-                    self.action()
-
-class Game:
-    def __init__(self, start_scene="start"):
-        self.screen = screen
+# Typewriter speed for dialogue text.
+CHARS_PER_SECOND = 1000 / 30
+
+# The story (scenes, dialogue, portraits, backgrounds and decisions) comes
+# from the compiled story script; see story.py and data/story.txt.
+with startup.step("story"):
+    STORY = story.load_story(resource_path(os.path.join("data", "story.txt")), resource_path(""))
+PORTRAIT_WIDTH = 300  # Change this value for a different size
+# Images that belong to one part of the story; the cache may evict them once
+# the player can no longer reach a scene that shows them.
+STORY_IMAGES = STORY.images()
+
+# How many decisions ahead Game loads images in the background.
+PREFETCH_DEPTH = 2
+# Milliseconds per frame spent storing prefetched images.
+PREFETCH_BUDGET = 2
+
+def layout_story(font):
+    """
+    Breaks every line of the story into rows and pages that fit the dialogue
+    box at the window's resolution.
+
+    :param font: The dialogue font at that resolution (see fonts.scaled).
+    """
+    width, height = display.size(TEXT_RECT.size)
+    return {line: layout.layout_text(line.text, font, width, height)
+            for scene in STORY.scenes for line in scene.lines}
+
+# init() sets the buttons' font and click sound.
+class AnimatedButton(widgets.AnimatedButton):
+    owner = "game"
+
+class DecisionButton(AnimatedButton):
+    skin_path = "images/button_icon.png"
+    smooth = True
+
+def init():
+    """
+    Opens the window and loads the dialogue font (a system font lookup) and the
+    click sound. Game calls it when it is created; only the first call does anything.
+
+    :return: The screen.
+    """
+    global screen, font
+    if screen is not None:
+        return screen
+    window = display.init()
+    with startup.step("game"):
+        font = fonts.get_font("Arial", 24, sysfont=True)
+        AnimatedButton.font = font
+        AnimatedButton.click_sound = widgets.click_sound()
+    screen = window
+    return screen
+
+def draw_border(surface, color, rect, width):
+    """
+    Same pixels as pygame.draw.rect(surface, color, rect, width), but correct under a
+    clip rect: draw.rect outlines the *clipped* rect, which paints borders inside
+    small dirty regions.
+    """
+    surface.fill(color, (rect.x, rect.y, rect.width, width))
+    surface.fill(color, (rect.x, rect.bottom - width, rect.width, width))
+    surface.fill(color, (rect.x, rect.y, width, rect.height))
+    surface.fill(color, (rect.right - width, rect.y, width, rect.height))
+
+def merge_rects(rects):
+    """Merges overlapping rects so no area is redrawn twice."""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if rect.colliderect(merged[i]):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+def reachable_scenes(scene, depth=PREFETCH_DEPTH):
+    """scene followed by every StoryScene at most depth decisions ahead of it, nearest first."""
+    found = [scene]
+    frontier = [scene]
+    for _ in range(depth):
+        frontier = [STORY.scenes[choice.target] for current in frontier for choice in current.choices]
+        frontier = [next_scene for next_scene in dict.fromkeys(frontier) if next_scene not in found]
+        found += frontier
+    return found
+
+def scene_music(scene):
+    """Tracks of scene and of every scene within PREFETCH_DEPTH decisions of it."""
+    return [reachable.music for reachable in reachable_scenes(scene) if reachable.music]
+
+def scene_image_requests(scene):
+    """The backgrounds and portraits a StoryScene shows, as assets.LoadJob requests."""
+    backgrounds = [path for path in dict.fromkeys(scene.backgrounds) if path]
+    portraits = [path for path in scene.images() if path not in backgrounds]
+    portrait = assets.size_for_width(display.scaled(PORTRAIT_WIDTH))
+    return ([(path, display.size((SCREEN_WIDTH, SCREEN_HEIGHT)), False, False) for path in backgrounds] +
+            [(path, portrait, True, False) for path in portraits])
+
+def asset_requests(start_scene=None):
+    """
+    The images a Game starting at start_scene needs right away, as assets.LoadJob
+    requests, so they can be loaded before it is created.
+    """
+    scene = STORY.scene(start_scene) if start_scene else STORY.scenes[STORY.start]
+    requests = [request for reachable in reachable_scenes(scene) for request in scene_image_requests(reachable)]
+    requests.append(("images/logo.png", display.size((400, 400)), True, False))
+    # Button skins (music button and decision buttons).
+    requests.append((AnimatedButton.skin_path, display.size((120, 40)), True, AnimatedButton.smooth))
+    requests.append((DecisionButton.skin_path, display.size((127, 71)), True, DecisionButton.smooth))
+    return requests
+
+def load_job(start_scene=None):
+    """
+    An assets.LoadJob for a Game starting at start_scene. Also starts reading
+    the music of the first scenes in the background.
+    """
+    scene = STORY.scene(start_scene) if start_scene else STORY.scenes[STORY.start]
+    music.player.preload(scene_music(scene))
+    return assets.LoadJob(asset_requests(start_scene), owner="game")
+
+class Game(Scene):
+    def __init__(self, start_scene=None, resume=None):
+        """
+        :param start_scene: Name of the scene to start in; defaults to the story's first chapter.
+        :param resume: A snapshot (see snapshot()) to continue from instead; it names its own scene.
+        """
+        if resume is not None:
+            start_scene = resume["scene"]
+        self.screen = init()
         pygame.display.set_caption("Death Trip - Redd en venn")
-        self.clock = pygame.time.Clock()
         self.running = True
-        self.font = pygame.font.SysFont("Arial", 24)
         
-        self.config_volume = read_config()
+        self.config_volume = config.store.get("volume")
         self.music_on = True
-        self.current_music = None  # To track which music is loaded
         
         self.music_button = AnimatedButton("Musikk: på", 20, 20, 120, 40, self.toggle_music)
         
-        original_you = pygame.image.load(resource_path("images/you.png")).convert_alpha()
-        original_venn = pygame.image.load(resource_path("images/venn.png")).convert_alpha()
-        target_width = 300  # Change this value for a different size
-        you_width, you_height = original_you.get_size()
-        venn_width, venn_height = original_venn.get_size()
-        you_scale = target_width / you_width
-        venn_scale = target_width / venn_width
-        self.you_img = pygame.transform.scale(original_you, (target_width, int(you_height * you_scale)))
-        self.venn_img = pygame.transform.scale(original_venn, (target_width, int(venn_height * venn_scale)))
-        
-        alt_you1 = pygame.image.load(resource_path("images/concerned_you1.png")).convert_alpha()
-        alt_you2 = pygame.image.load(resource_path("images/concerned_you2.png")).convert_alpha()
-        concerned_you_scale = target_width / alt_you1.get_width()
-        self.concerned_you_imgs = [
-            pygame.transform.scale(alt_you1, (target_width, int(alt_you1.get_height() * concerned_you_scale))),
-            pygame.transform.scale(alt_you2, (target_width, int(alt_you2.get_height() * concerned_you_scale)))
-        ]
-        
-        alt_venn1 = pygame.image.load(resource_path("images/drunk_venn1.png")).convert_alpha()
-        alt_venn2 = pygame.image.load(resource_path("images/drunk_venn2.png")).convert_alpha()
-        alt_venn3 = pygame.image.load(resource_path("images/drunk_venn3.png")).convert_alpha()
-        drunk_venn_scale = target_width / alt_venn1.get_width()
-        self.drunk_venn_imgs = [
-            pygame.transform.scale(alt_venn1, (target_width, int(alt_venn1.get_height() * drunk_venn_scale))),
-            pygame.transform.scale(alt_venn2, (target_width, int(alt_venn2.get_height() * drunk_venn_scale))),
-            pygame.transform.scale(alt_venn3, (target_width, int(alt_venn3.get_height() * drunk_venn_scale)))
-        ]
+        self.scene = STORY.scene(start_scene) if start_scene else STORY.scenes[STORY.start]
+        self.current_scene = self.scene.name
+        # Which image each speaker's portrait shows; it moves on after each of their lines.
+        self.portrait_index = {}
         
-        self.du_img_index = 0
-        self.venn_img_index = 0
+        # Backgrounds and portraits are looked up in the shared asset cache when
+        # they are drawn (see background() and portrait()) instead of being held
+        # here, so the cache can evict the ones the player can no longer reach.
+        self.prefetch_job = None
         
-        self.current_scene = start_scene
-        
-        self.backgrounds = {
-            "start": pygame.transform.scale(pygame.image.load(resource_path("images/chapter1.jpg")).convert(), (1088, 612)),
-            "decision_drink": pygame.transform.scale(pygame.image.load(resource_path("images/chapter2.jpg")).convert(), (1088, 612)),
-            "decision_no_drink": pygame.transform.scale(pygame.image.load(resource_path("images/chapter2.jpg")).convert(), (1088, 612)),
-            "scene_2": pygame.transform.scale(pygame.image.load(resource_path("images/chapter3_start.jpg")).convert(), (1088, 612)),
-            "decision_exit": pygame.transform.scale(pygame.image.load(resource_path("images/chapter3_start.jpg")).convert(), (1088, 612)),
-            "scene_3": pygame.transform.scale(pygame.image.load(resource_path("images/chapter4.jpg")).convert(), (1088, 612)),
-            "decision_try_stop": pygame.transform.scale(pygame.image.load(resource_path("images/chapter4.jpg")).convert(), (1088, 612)),
-            "scene_4": pygame.transform.scale(pygame.image.load(resource_path("images/chapter4.jpg")).convert(), (1088, 612)),
-            "decision_seat": pygame.transform.scale(pygame.image.load(resource_path("images/chapter4.jpg")).convert(), (1088, 612)),
-            "ending_stop": pygame.transform.scale(pygame.image.load(resource_path("images/chapter5.jpg")).convert(), (1088, 612)),
-            "ending_drive": pygame.transform.scale(pygame.image.load(resource_path("images/chapter5.jpg")).convert(), (1088, 612))
-        }
-        self.scene2_end_bg = pygame.transform.scale(pygame.image.load(resource_path("images/chapter3_end.jpg")).convert(), (1088, 612))
-        
-        self.dialogues = {
-            "start": [
-                "Venn: Hei, kom og ta en shot med oss!",
-                "Du: Jeg vet ikke, jeg skal tidlig opp i morgen.",
-                "Venn: Slapp av, én drink skader ikke! Vi skal jo bare ha det gøy."
-            ],
-            "scene_2": [
-                "Du: Hva gjør du?",
-                "Venn: Jeg skal hjem. Det går fint, jeg har kontroll.",
-                "Du: Er du sikker? Kanskje det er bedre å vente litt eller få noen til å kjøre deg?",
-                "Venn: Slapp av, jeg føler meg helt fin. Det er ikke noe problem.",
-                "Du: Det handler ikke bare om deg. Hva om noe skjer?",
-                "Venn: Det skjer ikke noe, jeg har full kontroll. Slutt å bekymre deg."
-            ],
-            "scene_3": [
-                "Du: Vent litt, kanskje vi heller kan bestille en taxi?",
-                "Venn: Nei, nei, jeg har det helt fint. Dette går bra.",
-                "Du: Men tenk om noe skjer? Det er ikke verdt risikoen.",
-                "Venn: Jeg sier det går fint. Hvorfor lager du så mye drama?"
-            ],
-            "scene_4": [
-                "Venn: Kom igjen, bare hopp inn, vi kommer oss kjapt hjem!",
-                "Du: Jeg vet ikke... Jeg føler meg ikke trygg.",
-                "Venn: Slutt å overtenke, det går bra! Vil du hjem eller ikke?"
-            ],
-            "ending_stop": [
-                "Dette kan bli realiteten."
-            ],
-            "ending_drive": [
-                "Vennen din kjørte under påvirkning ..."
-            ],
-            "info_drink": [
-                "Ruspåvirket tilstand er en av hovedårsakene til at unge dør i trafikken."
-            ],
-            "info_exit_A": [
-                "1 pils og du er på grensa. 0,2 promille kan endre alt."
-            ],
-            "info_try_stop_A": [
-                "1 av 4 dødsulykker i trafikken skyldes rus."
-            ],
-            "info_sete_B": [
-                "Det er ikke bare ditt liv du setter på spill. 1 av 3 som dør i trafikken er ikke sjåfør."
-            ]
-        }
-        self.current_dialogue_full = self.dialogues[self.current_scene]
-        self.dialogue_progress = ""
-        self.dialogue_index = 0
+        self.lines = self.scene.lines
         self.current_line_index = 0   # Track which dialogue line you're on.
-        self.dialogue_timer = 0       # Timer for typewriter effect (ms)
-        self.dialogue_finished = False
+        self.typewriter = Typewriter(font, chars_per_second=CHARS_PER_SECOND)
+        self.set_font(font)
         self.post_dialogue_timer = 0  # (Not used for auto-advance)
+        self.start_line()
         
         self.button_width = 127
         self.button_height = 71
         dialogue_box_height = 100
         bottom_margin = 20
-        dialogue_y = 612 - dialogue_box_height - bottom_margin
+        dialogue_y = SCREEN_HEIGHT - dialogue_box_height - bottom_margin
         self.button_y = dialogue_y - self.button_height - 10
         gap = 100  # increased gap between buttons
         total_buttons_width = self.button_width * 2 + gap  # two buttons with gap
-        self.left_x = (1088 - total_buttons_width) // 2
+        self.left_x = (SCREEN_WIDTH - total_buttons_width) // 2
         self.right_x = self.left_x + self.button_width + gap
         
         self.decision_buttons = {}
         self.info_mode = False
         self.info_text = ""
-        self.alternate = (self.current_scene != "start")
         
         self.ending_fade = 0
+        self.finished = False   # The last line of an ending or info scene was read.
+        
+        # Dirty rectangle bookkeeping (see render()).
+        self.full_redraw = FULL_REDRAW
+        self.needs_full_redraw = True
+        self.dirty_rects = []
+        self.last_scene_state = None
+        self.button_states = {}
+        self.logo_key = None
+        self.load_logo()
+        self.prefetch()
+        if resume is not None:
+            self.restore(resume)
+
+    def snapshot(self):
+        """The state savegame needs to bring the player back to this exact point."""
+        return {
+            "scene": self.scene.name,
+            "line": self.current_line_index,
+            "page": self.typewriter.page,
+            "revealed": self.dialogue_index,
+            "elapsed": self.typewriter.elapsed,
+            # A copy: the writer thread serializes it while the game goes on.
+            "portraits": dict(self.portrait_index),
+            "ending_fade": self.ending_fade,
+            "music_on": self.music_on,
+        }
+
+    def restore(self, state):
+        """Continues from a snapshot() of this scene."""
+        self.current_line_index = min(state["line"], len(self.lines))
+        self.portrait_index = dict(state["portraits"])
+        self.start_line()
+        if self.current_line_index < len(self.lines):
+            self.typewriter.seek(state["page"], state["revealed"], state["elapsed"])
+            self.dialogue_index = self.typewriter.revealed
+            self.dialogue_finished = self.typewriter.finished()
+        self.ending_fade = state["ending_fade"]
+        if not state["music_on"]:
+            self.toggle_music()
+
+    def save(self):
+        savegame.store.save(self.snapshot())
+
+    def load_logo(self):
+        # Held (see assets.hold) while the Game keeps it, at the current size.
+        self.release_logo()
+        size = display.size((400, 400))
         try:
-            self.logo_img = pygame.image.load(resource_path("images/logo.png")).convert_alpha()
+            self.logo_img = assets.load_image("images/logo.png", size, alpha=True, owner="game")
+            self.logo_key = assets.image_key("images/logo.png", size, alpha=True)
+            assets.hold(self.logo_key)
         except Exception as e:
             print("Error loading logo image:", e)
             self.logo_img = None
 
+    def release_logo(self):
+        if self.logo_key is not None:
+            assets.release(self.logo_key)
+        self.logo_key = None
+
+    def fit_resolution(self):
+        """After the window was resized: lays the dialogue out and loads the images again for the new size."""
+        if self.layout_scale == display.scale:
+            return
+        finished = self.dialogue_finished
+        self.set_font(self.font)
+        self.load_logo()
+        # The line starts over on its first page, laid out for the new size.
+        self.start_line()
+        if finished:
+            self.skip_dialogue()
+        self.prefetch()
+        self.button_states = {}
+        self.needs_full_redraw = True
+
+    def background(self):
+        """The current line's background, or None for a black screen."""
+        path = self.scene.backgrounds[self.current_line_index]
+        return assets.load_image(path, display.size((SCREEN_WIDTH, SCREEN_HEIGHT)), owner="game") if path else None
+
+    def portrait(self, path):
+        return assets.load_image_width(path, display.scaled(PORTRAIT_WIDTH), alpha=True, owner="game")
+
+    def prefetch(self):
+        """
+        Starts loading the images of every scene within PREFETCH_DEPTH decisions
+        in the background, and evicts images no reachable scene shows if the
+        cache is over its memory budget.
+        """
+        if self.prefetch_job is not None:
+            self.prefetch_job.cancel()
+        requests = [request for scene in reachable_scenes(self.scene)
+                    for request in scene_image_requests(scene)]
+        assets.trim(STORY_IMAGES - {request[0] for request in requests})
+        self.prefetch_job = assets.LoadJob(requests, owner="game")
+        music.player.preload(scene_music(self.scene))
+
+    def set_font(self, new_font):
+        """Uses new_font for dialogue; every line is laid out again, once, for it."""
+        self.font = new_font
+        # Text is rendered and laid out with the font at the window's resolution.
+        self.text_font = fonts.scaled(new_font, display.scale)
+        self.layout_scale = display.scale
+        self.typewriter.font = self.text_font
+        self.layouts = layout_story(self.text_font)
+
     def toggle_music(self):
         self.music_on = not self.music_on
         self.music_button.text = "Musikk: på" if self.music_on else "Musikk: av"
-        if self.music_on:
-            pygame.mixer.music.unpause()
-        else:
-            pygame.mixer.music.pause()
+        music.player.set_paused(not self.music_on)
 
     def reset_dialogue(self):
-        self.current_dialogue_full = self.dialogues.get(self.current_scene, [])
+        self.lines = self.scene.lines
         self.current_line_index = 0
-        self.dialogue_progress = ""
+        self.start_line()
+        self.post_dialogue_timer = 0
+        self.close_decision_buttons()
+        self.portrait_index = {}
+        self.prefetch()
+
+    def start_line(self):
+        """Starts the typewriter on the current dialogue line."""
+        if self.current_line_index < len(self.lines):
+            self.typewriter.start(self.layouts[self.lines[self.current_line_index]])
+        else:
+            self.typewriter.start(None)
         self.dialogue_index = 0
-        self.dialogue_timer = 0
         self.dialogue_finished = False
-        self.post_dialogue_timer = 0
-        self.decision_buttons = {}
-        self.alternate = (self.current_scene != "start")
-        self.du_img_index = 0
-        self.venn_img_index = 0
 
     def update_dialogue(self, dt):
-        if self.current_line_index < len(self.current_dialogue_full):
-            if not self.dialogue_finished:
-                if self.dialogue_index < len(self.current_dialogue_full[self.current_line_index]):
-                    self.dialogue_timer += dt
-                    if self.dialogue_timer >= 30:
-                        self.dialogue_progress += self.current_dialogue_full[self.current_line_index][self.dialogue_index]
-                        self.dialogue_index += 1
-                        self.dialogue_timer = 0
-                else:
-                    self.dialogue_finished = True
-        else:
-            self.dialogue_progress = ""
+        # Time based: a slow frame reveals every character that is due.
+        if self.current_line_index < len(self.lines) and not self.dialogue_finished:
+            self.typewriter.update(dt)
+            self.dialogue_index = self.typewriter.revealed
+            self.dialogue_finished = self.typewriter.finished()
+
+    def skip_dialogue(self):
+        """Shows the rest of the current line at once."""
+        if self.current_line_index < len(self.lines) and not self.dialogue_finished:
+            self.typewriter.skip()
+            self.dialogue_index = self.typewriter.revealed
+            self.dialogue_finished = True
 
     def advance_dialogue(self):
         if self.dialogue_finished:
-            if self.current_line_index < len(self.current_dialogue_full):
-                if self.alternate:
-                    current_line = self.current_dialogue_full[self.current_line_index]
-                    if current_line.startswith("Du:"):
-                        self.du_img_index = (self.du_img_index + 1) % len(self.concerned_you_imgs)
-                    elif current_line.startswith("Venn:"):
-                        self.venn_img_index = (self.venn_img_index + 1) % len(self.drunk_venn_imgs)
+            # A line too long for the box goes on with its next page first.
+            if self.typewriter.next_page():
+                self.dialogue_index = self.typewriter.revealed
+                self.dialogue_finished = self.typewriter.finished()
+                self.save()
+                return
+            if self.current_line_index < len(self.lines):
+                analytics.log.event("line", scene=self.scene.name, line=self.current_line_index)
+                line = self.lines[self.current_line_index]
+                if line.portrait:
+                    index = self.portrait_index.get(line.speaker, 0)
+                    self.portrait_index[line.speaker] = (index + 1) % len(line.portrait.images)
                 self.current_line_index += 1
-                self.dialogue_progress = ""
-                self.dialogue_index = 0
-                self.dialogue_timer = 0
-                self.dialogue_finished = False
+                self.start_line()
+                self.save()
 
-            if self.current_line_index >= len(self.current_dialogue_full) and \
-               (self.current_scene.startswith("info_") or self.current_scene.startswith("ending_")):
+            # Info and ending scenes return to the menu after their last line.
+            if self.current_line_index >= len(self.lines) and self.scene.kind != "story":
+                if not self.finished:
+                    self.finished = True
+                    analytics.log.event("ending", scene=self.scene.name)
+                    savegame.store.clear()
                 self.info_transition()
 
     def draw_text(self, text, x, y, color=(255, 255, 255)):
-        text_surface = self.font.render(text, True, color)
-        self.screen.blit(text_surface, (x, y))
+        self.screen.blit(fonts.render(text, self.text_font, color), display.point((x, y)))
 
-    def draw_dialogue_box(self, dialogue):
-        box_rect = pygame.Rect(20, 612 - 100 - 20, 1088 - 40, 100)
+    def draw_dialogue_box(self, dialogue=None):
+        # Without a dialogue TextLayout the typewriter's revealed text is drawn.
+        box_rect = display.rect(DIALOGUE_BOX_RECT)
         pygame.draw.rect(self.screen, (50, 50, 50), box_rect)
-        pygame.draw.rect(self.screen, (255, 255, 255), box_rect, 2)
+        draw_border(self.screen, (255, 255, 255), box_rect, max(1, display.scaled(2)))
         
-        if self.current_line_index < len(self.current_dialogue_full):
-            current_line = self.current_dialogue_full[self.current_line_index]
-            if self.alternate:
-                if current_line.startswith("Du:"):
-                    img = self.concerned_you_imgs[self.du_img_index]
-                    y_pos = box_rect.top - img.get_height()
-                    self.screen.blit(img, (150, y_pos))
-                elif current_line.startswith("Venn:"):
-                    img = self.drunk_venn_imgs[self.venn_img_index]
-                    y_pos = box_rect.top - img.get_height()
-                    self.screen.blit(img, (1088 - img.get_width() - 150, y_pos))
-            else:
-                if current_line.startswith("Du:"):
-                    y_pos = box_rect.top - self.you_img.get_height()
-                    self.screen.blit(self.you_img, (150, y_pos))
-                elif current_line.startswith("Venn:"):
-                    y_pos = box_rect.top - self.venn_img.get_height()
-                    self.screen.blit(self.venn_img, (1088 - self.venn_img.get_width() - 150, y_pos))
+        if self.current_line_index < len(self.lines):
+            line = self.lines[self.current_line_index]
+            if line.portrait:
+                img = self.portrait(line.portrait.images[self.portrait_index.get(line.speaker, 0)])
+                y_pos = box_rect.top - img.get_height()
+                if line.portrait.side == "left":
+                    x_pos = display.point((150, 0))[0]
+                else:
+                    x_pos = display.point((SCREEN_WIDTH - 150, 0))[0] - img.get_width()
+                self.screen.blit(img, (x_pos, y_pos))
         
-        self.draw_text(dialogue, box_rect.x + 10, box_rect.y + 10)
+        if dialogue is None:
+            self.typewriter.draw(self.screen, display.point(TEXT_RECT.topleft))
+        else:
+            # The last page, as it was left when the line finished typing.
+            layout.draw_page(self.screen, dialogue, len(dialogue.pages) - 1, self.text_font,
+                             WHITE, display.point(TEXT_RECT.topleft))
 
     def create_decision_buttons(self):
-        if self.current_scene == "start":
-            self.decision_buttons = {
-                "Drikke": AnimatedButton("Drikk", self.left_x, self.button_y, self.button_width, self.button_height,
-                                          lambda: self.handle_decision("drink")),
-                "Ikke Drikke": AnimatedButton("Ikke Drikk", self.right_x, self.button_y, self.button_width, self.button_height,
-                                               lambda: self.handle_decision("no_drink"))
-            }
-        elif self.current_scene == "scene_2":
-            self.decision_buttons = {
-                "Ikke gå": AnimatedButton("Stopp han", self.left_x, self.button_y, self.button_width, self.button_height,
-                                          lambda: self.handle_decision("exit_decision_A")),
-                "Gå med": AnimatedButton("Følg etter", self.right_x, self.button_y, self.button_width, self.button_height,
-                                          lambda: self.handle_decision("exit_decision_B"))
-            }
-        elif self.current_scene == "scene_3":
-            self.decision_buttons = {
-                "Stoppe": AnimatedButton("Stopp han", self.left_x, self.button_y, self.button_width, self.button_height,
-                                         lambda: self.handle_decision("try_stop_A")),
-                "Ikke Stoppe": AnimatedButton("Gå mot bil", self.right_x, self.button_y, self.button_width, self.button_height,
-                                              lambda: self.handle_decision("try_stop_B"))
-            }
-        elif self.current_scene == "scene_4":
-            self.decision_buttons = {
-                "seat_A": AnimatedButton("Stå igjen", self.left_x, self.button_y, self.button_width, self.button_height,
-                                        lambda: self.handle_decision("seat_B")),  # swapped: now takes the outcome of seat_B
-                "seat_B": AnimatedButton("Sitt på", self.right_x, self.button_y, self.button_width, self.button_height,
-                                        lambda: self.handle_decision("seat_A"))   # swapped: now takes the outcome of seat_A
-            }
+        # One button per choice, centered side by side.
+        gap = 100
+        total_width = len(self.scene.choices) * (self.button_width + gap) - gap
+        x = (SCREEN_WIDTH - total_width) // 2
+        self.close_decision_buttons()
+        for choice in self.scene.choices:
+            self.decision_buttons[choice.label] = DecisionButton(
+                choice.label, x, self.button_y, self.button_width, self.button_height,
+                lambda target=choice.target: self.handle_decision(target))
+            x += self.button_width + gap
+
+    def close_decision_buttons(self):
         for btn in self.decision_buttons.values():
-            btn.draw = new_decision_draw.__get__(btn, AnimatedButton)
-
-    def handle_decision(self, decision):
-        if decision == "drink":
-            self.current_scene = "scene_2"
-        elif decision == "no_drink":
-            self.current_scene = "info_drink"
-        elif decision == "exit_decision_A":
-            self.current_scene = "info_exit_A"
-        elif decision == "exit_decision_B":
-            self.current_scene = "scene_3"
-        elif decision == "try_stop_A":
-            self.current_scene = "info_try_stop_A"
-        elif decision == "try_stop_B":
-            self.current_scene = "scene_4"
-        elif decision == "seat_A":
-            self.current_scene = "ending_stop"       # Modified: when sitting in, play "ending_stop" dialogue.
-        elif decision == "seat_B":
-            self.current_scene = "info_sete_B"
+            btn.close()
+        self.decision_buttons = {}
+
+    def handle_decision(self, target):
+        """Moves on to the scene with id target."""
+        choice = next((choice for choice in self.scene.choices if choice.target == target), None)
+        analytics.log.event("decision", scene=self.scene.name, choice=choice.label if choice else None,
+                            target=STORY.scenes[target].name)
+        self.scene = STORY.scenes[target]
+        self.current_scene = self.scene.name
+        analytics.log.event("scene", scene=self.scene.name)
         self.reset_dialogue()
+        music.player.play(self.scene.music)
+        self.save()
 
     def info_transition(self):
         # End the game loop so control returns to the menu.
@@ -361,87 +445,192 @@ class Game:
 
     def draw_info_logo(self):
         if self.logo_img:
-            small_logo = pygame.transform.scale(self.logo_img, (400, 400))
-            logo_rect = small_logo.get_rect(center=(1088 // 2, 612 // 2 - 80))
-            self.screen.blit(small_logo, logo_rect)
+            logo_rect = self.logo_img.get_rect(center=display.point((SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 80)))
+            self.screen.blit(self.logo_img, logo_rect)
+
+    def update_scene(self, dt):
+        self.update_dialogue(dt)
+        if self.scene.kind != "ending":
+            if self.current_line_index >= len(self.lines):
+                if not self.decision_buttons:
+                    self.create_decision_buttons()
+                for btn in self.decision_buttons.values():
+                    btn.update()
+        if self.scene.kind == "ending" and self.current_line_index >= len(self.lines):
+            self.ending_fade = min(255, self.ending_fade + dt / 5)
+        self.music_button.update()
 
     def draw_scene(self):
-        if self.current_scene in {"ending_stop", "ending_drive", "bad_ending"}:
-            chapter5_bg = self.backgrounds.get("ending_stop")
-            if chapter5_bg:
-                self.screen.blit(chapter5_bg, (0, 0))
-            else:
-                self.screen.fill((0, 0, 0))
-            
+        bg = self.background()
+        if bg:
+            self.screen.blit(bg, display.view)
+        else:
+            self.screen.fill((0, 0, 0), display.view)
+        
+        if self.scene.kind == "ending":
             # Force using the stored final dialogue text for ending scenes
-            dialogue_to_draw = self.current_dialogue_full[-1] if self.current_dialogue_full else ""
+            dialogue_to_draw = self.layouts[self.lines[-1]] if self.lines else \
+                layout.layout_text("", self.text_font, display.scaled(TEXT_RECT.width))
             self.draw_dialogue_box(dialogue_to_draw)
             
             if self.logo_img:
                 self.draw_info_logo()
-        elif self.current_scene == "scene_2" and self.current_line_index >= 2:
-            self.screen.blit(self.scene2_end_bg, (0, 0))
-        else:
-            bg = self.backgrounds.get(self.current_scene)
-            if bg:
-                self.screen.blit(bg, (0, 0))
-            else:
-                self.screen.fill((0, 0, 0))
         
-        if self.current_scene.startswith("info_"):
+        if self.scene.kind == "info":
             self.draw_info_logo()
         
-        if self.current_scene not in {"ending_stop", "ending_drive", "bad_ending"}:
-            if self.current_line_index < len(self.current_dialogue_full):
-                self.draw_dialogue_box(self.dialogue_progress)
+        if self.scene.kind != "ending":
+            if self.current_line_index < len(self.lines):
+                self.draw_dialogue_box()
             else:
-                if not self.decision_buttons:
-                    self.create_decision_buttons()
                 for btn in self.decision_buttons.values():
-                    btn.update()
                     btn.draw(self.screen)
             
-        if self.current_scene in {"ending_stop", "ending_drive"} and self.current_line_index >= len(self.current_dialogue_full):
-            self.ending_fade = min(255, self.ending_fade + self.clock.get_time() / 5)
-            fade_surf = pygame.Surface((1088, 612))
-            fade_surf.fill((0, 0, 0))
+        if self.scene.kind == "ending" and self.current_line_index >= len(self.lines):
+            fade_surf = transition.overlay(self.screen.get_size())
             fade_surf.set_alpha(self.ending_fade)
             self.screen.blit(fade_surf, (0, 0))
             if self.logo_img and self.ending_fade >= 255:
                 self.draw_info_logo()
         
-        self.music_button.update()
         self.music_button.draw(self.screen)
 
-    def run(self):
-        from settings import read_music_config
-        while self.running:
-            dt = self.clock.tick(60)
-            desired_track = os.path.join("sound", "scene1.wav") if self.current_scene == "start" else os.path.join("sound", "scene2+.wav")
-            if self.current_music != desired_track:
-                self.current_music = desired_track
-                pygame.mixer.music.load(resource_path(self.current_music))
-                pygame.mixer.music.play(-1)
-            music_volume = read_music_config()
-            pygame.mixer.music.set_volume(min(music_volume / 5.0, 1.0))
-            if not self.music_on:
-                pygame.mixer.music.pause()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                self.music_button.handle_event(event)
-                if self.decision_buttons:
-                    for btn in self.decision_buttons.values():
-                        btn.handle_event(event)
-                else:
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        if self.dialogue_finished:
-                            self.advance_dialogue()
-            self.update_dialogue(dt)
+    def invalidate(self, rect=None):
+        """Marks part of the screen (a logical rect) for redrawing; without a rect the whole frame is redrawn."""
+        if rect is None:
+            self.needs_full_redraw = True
+        else:
+            rect = display.rect(rect)
+            if display.scale != 1:
+                # Scaled images get a rounded size rather than rounded edges, so
+                # they can reach a pixel past the mapped rect.
+                rect.inflate_ip(2, 2)
+            self.dirty_rects.append(rect)
+
+
+    def collect_dirty_rects(self):
+        # Anything that changes the background, the portraits, which widgets are
+        # shown or the ending fade overlay needs the whole frame.
+        scene_state = (self.scene.id, self.current_line_index, self.typewriter.page,
+                       tuple(self.portrait_index.items()), tuple(self.decision_buttons),
+                       self.ending_fade)
+        if scene_state != self.last_scene_state:
+            self.last_scene_state = scene_state
+            self.button_states = {}
+            self.invalidate()
+        # The typewriter only uncovers the glyphs revealed since the last frame
+        # (its rects are in window pixels already).
+        self.dirty_rects += self.typewriter.reveal_rects(display.point(TEXT_RECT.topleft))
+        # Buttons move when pressed and the music button changes its label.
+        for btn in [self.music_button] + list(self.decision_buttons.values()):
+            state = (btn.rect.copy(), btn.text)
+            last_state = self.button_states.get(btn)
+            if state != last_state:
+                if last_state:
+                    self.invalidate(last_state[0])
+                self.invalidate(btn.rect)
+                self.button_states[btn] = state
+
+    def draw(self, screen):
+        self.fit_resolution()
+        self.draw_scene()
+
+    def render(self, screen):
+        self.fit_resolution()
+        if self.full_redraw:
+            self.draw_scene()
+            return None
+        self.collect_dirty_rects()
+        rects = []
+        if self.needs_full_redraw:
             self.draw_scene()
-            pygame.display.flip()
-        pygame.mixer.music.stop()
+            rects = None
+        elif self.dirty_rects:
+            # Redraw the scene clipped to each dirty rect; blits outside the clip
+            # area cost next to nothing.
+            rects = merge_rects(self.dirty_rects)
+            for rect in rects:
+                self.screen.set_clip(rect)
+                self.draw_scene()
+            self.screen.set_clip(None)
+        self.needs_full_redraw = False
+        self.dirty_rects = []
+        return rects
+
+    def apply_music_volume(self, music_volume):
+        music.player.set_volume(min(music_volume / 5.0, 1.0))
+
+    def is_animating(self):
+        """True while something moves without input: typewriter text, a held button or the ending fade."""
+        if self.prefetch_job is not None:
+            return True  # Keep storing prefetched images even while the player reads.
+        if self.current_line_index < len(self.lines) and not self.dialogue_finished:
+            return True
+        if self.music_button.pressed or any(btn.pressed for btn in self.decision_buttons.values()):
+            return True
+        return (self.scene.kind == "ending" and
+                self.current_line_index >= len(self.lines) and self.ending_fade < 255)
+
+    def enter(self):
+        # Volume changes arrive through the config store instead of re-reading
+        # music_config.txt every frame.
+        config.store.subscribe("music_volume", self.apply_music_volume)
+        self.apply_music_volume(config.store.get("music_volume"))
+        # The track changes only when the scene does (see handle_decision),
+        # so the frame loop never touches the mixer.
+        music.player.play(self.scene.music)
+        analytics.log.start_session(self.scene.name)
+
+    def exit(self):
+        if not self.finished:
+            analytics.log.event("quit", scene=self.scene.name, line=self.current_line_index)
+        analytics.log.end_session()
+        if not self.finished:
+            self.save()  # Where the player left off, down to the characters typed.
+        if self.prefetch_job is not None:
+            self.prefetch_job.cancel()
+            self.prefetch_job = None
+        music.player.stop()
+        config.store.unsubscribe("music_volume", self.apply_music_volume)
+        # Lets the caches evict what this Game held.
+        self.music_button.close()
+        self.close_decision_buttons()
+        self.typewriter.close()
+        self.release_logo()
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.running = False
+        self.music_button.handle_event(event)
+        if self.decision_buttons:
+            for btn in self.decision_buttons.values():
+                btn.handle_event(event)
+        else:
+            # Click (or space/enter) shows the rest of a line that is still
+            # typing, and moves on to the next line once it is complete.
+            if event.type == pygame.MOUSEBUTTONDOWN or \
+               (event.type == pygame.KEYDOWN and event.key in (pygame.K_SPACE, pygame.K_RETURN)):
+                if self.dialogue_finished:
+                    self.advance_dialogue()
+                else:
+                    self.skip_dialogue()
+
+    def update(self, dt):
+        if not self.running:
+            # Back to whatever scene started the game.
+            self.manager.pop(fade=True)
+            return
+        with profiler.zone("prefetch"):
+            if self.prefetch_job is not None and self.prefetch_job.finish(PREFETCH_BUDGET):
+                self.prefetch_job = None
+        with profiler.zone("scene"):
+            self.update_scene(dt)
+
+    def run(self):
+        # Standalone entry point; inside the app the menu pushes Game onto its SceneManager.
+        manager = SceneManager(self.screen)
+        manager.push(self)
+        manager.run()
 
 if __name__ == "__main__":
     game = Game()  # Defaults to "start" scene.
@@ -0,0 +1,230 @@
+"""
+Golden-image render regression check.
+
+    python code/golden.py --update       # on a known good build: store the golden frames
+    python code/golden.py                # render again and compare
+    python code/golden.py scene:scene_2 menu --jobs 4
+
+Renders key frames of the menus, of every story scene and of every transition
+style offscreen (SDL dummy driver). Story scenes are played through the same
+dirty-rect render() the game uses. The frames are compared with the PNGs in
+--golden-dir. A frame fails when more than --tolerance of its pixels differ by
+more than --threshold in some channel. Failing frames are written with a diff
+image to --output-dir. The sequences are spread over a pool of worker processes.
+
+Golden frames depend on the fonts and SDL version of the machine that made
+them, so compare against frames made on the same setup.
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import story
+
+base_path = os.path.dirname(os.path.abspath(__file__))
+
+DT = 1000 / 60
+# Frames a line types for before its "typing" key frame.
+TYPING_FRAMES = 12
+
+def sequence_names():
+    """Every sequence of key frames: menus, each story scene and each transition style."""
+    import transition
+    graph = story.load_story(os.path.join(base_path, "data", "story.txt"))
+    return (["menu", "chapter_select", "settings"] +
+            ["scene:" + scene.name for scene in graph.scenes] +
+            ["transition:" + name for name in transition.TRANSITIONS])
+
+# --- Sequences: each yields (frame name, surface) ---
+def render_menu():
+    import menu
+    screen = menu.init()
+    scene = menu.MenuScene()
+    scene.draw(screen)
+    yield "idle", screen
+    scene.buttons[0].pressed = True
+    scene.update(DT)
+    scene.draw(screen)
+    yield "pressed", screen
+
+def render_chapter_select():
+    import menu
+    screen = menu.init()
+    scene = menu.ChapterSelectScene()
+    scene.draw(screen)
+    yield "idle", screen
+
+def render_settings():
+    import display
+    import settings
+    screen = display.init()
+    scene = settings.SettingsScene()
+    # Fixed slider positions, whatever is in the local config files.
+    scene.click_slider.set_value(2.5)
+    scene.music_slider.set_value(1.0)
+    scene.draw(screen)
+    yield "idle", screen
+    scene.exit()
+
+def render_scene(name):
+    import assets
+    import game
+    game.init()
+    assets.LoadJob(game.asset_requests(name)).finish()
+    g = game.Game(start_scene=name)
+    screen = g.screen
+
+    def frame(count=1):
+        for _ in range(count):
+            g.update_scene(DT)
+            g.render(screen)
+
+    frame()
+    for index in range(len(g.lines)):
+        frame(TYPING_FRAMES)
+        yield f"line{index}_typing", screen
+        while True:
+            g.skip_dialogue()
+            frame()
+            yield f"line{index}_page{g.typewriter.page}", screen
+            if not g.typewriter.has_next_page():
+                break
+            g.advance_dialogue()
+        if index + 1 < len(g.lines):
+            g.advance_dialogue()
+    if g.scene.kind == "story":
+        g.advance_dialogue()
+        frame()
+        yield "choices", screen
+        button = next(iter(g.decision_buttons.values()))
+        button.pressed = True
+        frame()
+        yield "choice_pressed", screen
+    elif g.scene.kind == "ending":
+        # The fade over the last line once it is done.
+        g.current_line_index = len(g.lines)
+        frame(20)
+        yield "ending_fade", screen
+        frame(100)
+        yield "ending_logo", screen
+    if g.prefetch_job is not None:
+        g.prefetch_job.cancel()
+
+def render_transition(name):
+    import menu
+    import transition
+    screen = menu.init()
+    menu_scene = menu.MenuScene()
+    chapter_select = menu.ChapterSelectScene()
+    menu_scene.draw(screen)
+    effect = transition.create(name, screen, color=menu.BLACK)
+    elapsed = 0
+    # Key frames a quarter, half and three quarters through each phase.
+    for phase in effect.phases:
+        for point in (0.25, 0.5, 0.75):
+            while effect.phase == phase and elapsed < effect.duration * point:
+                effect.update(DT)
+                elapsed += DT
+            scene = menu_scene if effect.phase == "fade_in" else chapter_select
+            scene.draw(screen)
+            effect.draw()
+            yield f"{phase}_{int(point * 100)}", screen
+        while effect.phase == phase and not effect.done:
+            effect.update(DT)
+        elapsed = 0
+
+def render_sequence(name):
+    kind, _, argument = name.partition(":")
+    if kind == "scene":
+        return render_scene(argument)
+    if kind == "transition":
+        return render_transition(argument)
+    return {"menu": render_menu, "chapter_select": render_chapter_select,
+            "settings": render_settings}[kind]()
+
+# --- Comparison ---
+def difference(surface, golden, threshold):
+    """Returns (number of pixels that differ by more than threshold, |surface - golden| image)."""
+    import pygame
+    diff = surface.copy()
+    diff.blit(golden, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+    other = golden.copy()
+    other.blit(surface, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+    diff.blit(other, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+    # Pixels within threshold of black (no difference) are set in the mask.
+    same = pygame.mask.from_threshold(diff, (0, 0, 0), (threshold + 1,) * 3 + (255,))
+    width, height = diff.get_size()
+    return width * height - same.count(), diff
+
+def init_worker():
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+def check_sequence(task):
+    """Worker: renders one sequence and compares (or stores) its frames."""
+    name, golden_dir, output_dir, update, threshold, tolerance = task
+    import pygame
+    results = []
+    try:
+        for frame_name, surface in render_sequence(name):
+            file_name = name.replace(":", "_") + "__" + frame_name + ".png"
+            golden_path = os.path.join(golden_dir, file_name)
+            result = {"frame": f"{name}/{frame_name}", "file": file_name}
+            if update:
+                pygame.image.save(surface, golden_path)
+                result["status"] = "updated"
+            elif not os.path.exists(golden_path):
+                result["status"] = "missing"
+            else:
+                golden = pygame.image.load(golden_path).convert()
+                if golden.get_size() != surface.get_size():
+                    result["status"] = "size"
+                else:
+                    changed, diff = difference(surface, golden, threshold)
+                    result["changed"] = changed / (surface.get_width() * surface.get_height())
+                    result["status"] = "ok" if result["changed"] <= tolerance else "changed"
+                    if result["status"] == "changed":
+                        pygame.image.save(surface, os.path.join(output_dir, file_name))
+                        pygame.image.save(diff, os.path.join(output_dir, "diff__" + file_name))
+            results.append(result)
+    except Exception as e:
+        results.append({"frame": name, "status": "error", "error": f"{type(e).__name__}: {e}"})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Render key frames and compare them with golden images.")
+    parser.add_argument("sequences", nargs="*", help="sequences to check (default: all)")
+    parser.add_argument("--update", action="store_true", help="store the rendered frames as the new golden frames")
+    parser.add_argument("--golden-dir", default=os.path.join(base_path, "golden"))
+    parser.add_argument("--output-dir", default="golden_out", help="failing frames and their diffs go here")
+    parser.add_argument("--threshold", type=int, default=8, help="channel difference ignored per pixel")
+    parser.add_argument("--tolerance", type=float, default=0.001, help="fraction of pixels allowed to differ")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    names = args.sequences or sequence_names()
+    golden_dir = os.path.abspath(args.golden_dir)
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(golden_dir if args.update else output_dir, exist_ok=True)
+    tasks = [(name, golden_dir, output_dir, args.update, args.threshold, args.tolerance) for name in names]
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.jobs, initializer=init_worker) as pool:
+        results = [result for sequence in pool.imap(check_sequence, tasks) for result in sequence]
+        # SDL catches the SIGTERM terminate() would send; let the workers exit instead.
+        pool.close()
+        pool.join()
+    seconds = time.perf_counter() - started
+
+    failed = [result for result in results if result["status"] not in ("ok", "updated")]
+    for result in failed:
+        detail = result.get("error") or (f"{result['changed']:.2%} of pixels differ" if "changed" in result else "")
+        print(f"{result['status']:8} {result['frame']}  {detail}")
+    print(f"{len(results)} frames, {len(failed)} failed, {len(names)} sequences "
+          f"with {args.jobs} workers in {seconds:.1f} s")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Word-wrapped, paginated text layout.
+
+layout_text() breaks a string into rows that fit a width, using glyph
+advances cached per font, and groups the rows into pages that fit a height.
+It runs once per string and font; drawing and the typewriter reveal only
+walk the finished rows and never measure text again.
+"""
+import fonts
+
+class Row:
+    def __init__(self, text, start, y, offsets, height):
+        """
+        :param text: The row's characters (without the space it was broken at).
+        :param start: Index of the row's first character in the laid out string.
+        :param y: Top of the row relative to the top of its page.
+        :param offsets: x where each prefix of the row ends, len(text) + 1 entries.
+        :param height: Height of the rendered row.
+        """
+        self.text = text
+        self.start = start
+        self.end = start + len(text)
+        self.y = y
+        self.offsets = offsets
+        self.height = height
+
+class TextLayout:
+    """A string broken into rows, and the rows split into pages."""
+    def __init__(self, text, pages):
+        self.text = text
+        self.pages = pages  # Lists of Rows; every page has at least one row.
+
+    def page_range(self, page):
+        """Index of the first character on a page and the index just past its last one."""
+        rows = self.pages[page]
+        return rows[0].start, rows[-1].end
+
+_layouts = {}
+
+def layout_text(text, font, width, height=None):
+    """
+    Returns text broken into rows no wider than width and pages of rows no
+    taller than height, laying it out only the first time.
+
+    :param height: Page height; None puts every row on one page.
+    """
+    key = (text, font, width, height)
+    text_layout = _layouts.get(key)
+    if text_layout is None:
+        text_layout = _layouts[key] = _layout(text, font, width, height)
+    return text_layout
+
+def _layout(text, font, width, height):
+    advances = fonts.advances(font, text)
+    line_height = font.get_linesize()
+    rows_per_page = max(1, height // line_height) if height is not None else None
+    rows = []
+    for start, end in _breaks(text, font, advances, width):
+        offsets = [0]
+        for advance in advances[start:end]:
+            offsets.append(offsets[-1] + advance)
+        row_width, row_height = font.size(text[start:end])
+        # The whole row ends exactly where its rendering does.
+        offsets = [min(offset, row_width) for offset in offsets[:-1]] + [row_width]
+        rows.append(Row(text[start:end], start, 0, offsets, row_height))
+    if not rows:
+        rows.append(Row("", 0, 0, [0], font.get_height()))
+    pages = []
+    for row in rows:
+        if not pages or len(pages[-1]) == rows_per_page:
+            pages.append([])
+        row.y = len(pages[-1]) * line_height
+        pages[-1].append(row)
+    return TextLayout(text, pages)
+
+def _breaks(text, font, advances, width):
+    """Yields (start, end) of each row, breaking at spaces and inside words only when a word is wider than a row."""
+    start = 0
+    while True:
+        # Skip the spaces a row was broken at.
+        while start < len(text) and text[start] == " ":
+            start += 1
+        if start >= len(text):
+            return
+        end = _row_end(text, advances, start, width)
+        # Advances leave out kerning; check the rendered width and give words back until it fits.
+        while end > start + 1 and font.size(text[start:end])[0] > width:
+            space = text.rfind(" ", start, end - 1)
+            end = space if space > start else end - 1
+        yield start, end
+        start = end
+
+def _row_end(text, advances, start, width):
+    """Index just past the last word (or character) starting at start that still fits width."""
+    x = 0
+    last_space = None
+    for index in range(start, len(text)):
+        if text[index] == " ":
+            last_space = index
+        x += advances[index]
+        if x > width:
+            if last_space is not None:
+                return last_space
+            return max(index, start + 1)
+    return len(text)
+
+def draw_page(surface, text_layout, page, font, color, pos):
+    """Blits every row of a page with the page's top left at pos."""
+    x, y = pos
+    for row in text_layout.pages[page]:
+        if row.text:
+            surface.blit(fonts.render(row.text, font, color), (x, y + row.y))
@@ -0,0 +1,203 @@
+"""
+Surface memory accounting: how many bytes of pixels the game holds, and for whom.
+
+    from memory import tracker
+    print(tracker.format_report())
+
+Long-lived surfaces all sit in a few caches, so the tracker reads them when it
+is asked instead of hooking every allocation:
+
+    - the image cache (assets.py), by the owner each image was loaded for
+      ("menu", "settings", "game"; "shared" if the loader did not say),
+    - the transition pool (transition.py): the snapshot and fade overlays,
+    - the text caches (fonts.py): rendered strings and glyph atlases,
+    - the window itself.
+
+A surface held by several caches is counted once. Transient allocations (any
+surface created on a frame, see assets.note_allocation) are counted per frame
+by end_frame(), which SceneManager calls on every pass of its loop.
+
+F5 prints the report, F6 writes it to DUMP_PATH as JSON. Set
+DEATHTRIP_SURFACE_BUDGET_MB for a hard budget over all of it. When the game
+goes over the budget it prints a warning, or with
+DEATHTRIP_SURFACE_BUDGET_ACTION=evict drops cached text and images, least
+recently used first, until it fits. Surfaces a screen holds (button skins and
+labels, the logo, the typewriter's rows; see assets.hold) are never evicted,
+since that would free nothing, and neither are the images the last frame
+drew, which would only be decoded again. If the rest does not make it fit,
+only the warning is printed. The budget is only checked on frames that
+created surfaces, so steady frames cost nothing.
+"""
+import os
+import json
+from collections import deque
+import pygame
+import assets
+import fonts
+import transition
+
+# Frames kept for the transient allocation statistics.
+HISTORY = 240
+REPORT_KEY = pygame.K_F5
+DUMP_KEY = pygame.K_F6
+DUMP_PATH = os.environ.get("DEATHTRIP_MEMORY_FILE", "memory_report.json")
+
+MB = 1024 * 1024
+
+def surfaces():
+    """
+    Every long-lived surface the game holds, each once.
+
+    :return: (owner, kind, name, surface) tuples. kind is the cache the surface sits in.
+    """
+    seen = set()
+    found = []
+
+    def add(owner, kind, name, surface):
+        if surface is not None and id(surface) not in seen:
+            seen.add(id(surface))
+            found.append((owner, kind, name, surface))
+
+    add("display", "window", "screen", pygame.display.get_surface())
+    for key, surface in assets.cached_items():
+        add(assets.owner_of(key), "image", str(key[0]), surface)
+    for name, surface in transition.pooled_surfaces():
+        add("transition", "pool", name, surface)
+    for kind, name, surface in fonts.cached_surfaces():
+        add("text", kind, name, surface)
+    return found
+
+def usage():
+    """Bytes and number of surfaces per owner, and in total."""
+    owners = {}
+    total = 0
+    for owner, _, _, surface in surfaces():
+        size = assets.surface_bytes(surface)
+        entry = owners.setdefault(owner, {"bytes": 0, "surfaces": 0})
+        entry["bytes"] += size
+        entry["surfaces"] += 1
+        total += size
+    return {"owners": owners, "bytes": total}
+
+class MemoryTracker:
+    def __init__(self, budget=None, action="warn"):
+        """
+        :param budget: Bytes all surfaces together may hold, or None for no budget.
+        :param action: What to do over the budget: "warn" or "evict".
+        """
+        self.budget = budget
+        self.action = action
+        self.history = deque(maxlen=HISTORY)    # Surfaces allocated on each recent frame.
+        self.frames = 0
+        self.allocations = 0
+        self.peak_bytes = 0
+        self.over_budget = False
+        self._last_count = assets.allocation_count
+
+    def end_frame(self):
+        """Closes the current frame; call once per pass of a main loop."""
+        count = assets.allocation_count
+        allocated = count - self._last_count
+        self._last_count = count
+        self.history.append(allocated)
+        self.frames += 1
+        if allocated:
+            self.allocations += allocated
+            self.check_budget()
+        assets.new_frame()
+
+    def check_budget(self):
+        """Warns or evicts if the surfaces are over the budget; returns the bytes held."""
+        held = usage()["bytes"]
+        self.peak_bytes = max(self.peak_bytes, held)
+        if self.budget is None or held <= self.budget:
+            self.over_budget = False
+            return held
+        if self.action == "evict":
+            held = self.evict()
+        if held > self.budget and not self.over_budget:
+            # Once per crossing, not on every frame it stays over.
+            print("Surface memory over budget: %.1f MB of %.1f MB" % (held / MB, self.budget / MB))
+        self.over_budget = held > self.budget
+        return held
+
+    def evict(self):
+        """
+        Frees memory until the surfaces fit the budget, if the caches can: first
+        the rendered text, then images, least recently used first. Held surfaces
+        (see assets.hold) stay; screens load the others again when they next
+        draw them.
+
+        :return: Bytes held afterwards.
+        """
+        fonts.clear_rendered()
+        held = usage()["bytes"]
+        if held > self.budget:
+            images = assets.cache_bytes()
+            # What the last frame drew stays, or the next one would decode it again.
+            assets.trim(None, max(0, images - (held - self.budget)), keep=assets.frame_keys())
+            held = usage()["bytes"]
+        return held
+
+    def handle_event(self, event):
+        """Handles the report keys; returns True if the event was one of them."""
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == REPORT_KEY:
+            print(self.format_report())
+            return True
+        if event.key == DUMP_KEY:
+            self.dump()
+            return True
+        return False
+
+    def report(self):
+        """The accounting as a dict: owners, every surface, and transient allocation statistics."""
+        from profiling import percentile
+        found = surfaces()
+        held = usage()
+        self.peak_bytes = max(self.peak_bytes, held["bytes"])
+        frames = list(self.history)
+        return {
+            "bytes": held["bytes"],
+            "peak_bytes": self.peak_bytes,
+            "budget_bytes": self.budget,
+            "owners": held["owners"],
+            "surfaces": [{"owner": owner, "kind": kind, "name": name,
+                          "size": list(surface.get_size()), "bytes": assets.surface_bytes(surface)}
+                         for owner, kind, name, surface in found],
+            "transient": {
+                "frames": self.frames,
+                "allocations": self.allocations,
+                "recent_frames": len(frames),
+                "per_frame": {
+                    "mean": round(sum(frames) / len(frames), 3) if frames else 0.0,
+                    "p95": percentile(frames, 95),
+                    "max": max(frames, default=0),
+                },
+                "frames_allocating": sum(1 for allocated in frames if allocated),
+            },
+        }
+
+    def format_report(self):
+        """A short table of bytes per owner, for the console."""
+        report = self.report()
+        lines = ["Surface memory: %.1f MB (peak %.1f MB%s)" % (
+            report["bytes"] / MB, report["peak_bytes"] / MB,
+            ", budget %.1f MB" % (self.budget / MB) if self.budget is not None else "")]
+        for owner, entry in sorted(report["owners"].items(), key=lambda item: -item[1]["bytes"]):
+            lines.append("  %-10s %8.2f MB  %4d surfaces" % (owner, entry["bytes"] / MB, entry["surfaces"]))
+        transient = report["transient"]
+        lines.append("  transient: %d surfaces on %d of the last %d frames (max %d per frame)" % (
+            sum(self.history), transient["frames_allocating"], transient["recent_frames"],
+            transient["per_frame"]["max"]))
+        return "\n".join(lines)
+
+    def dump(self, path=DUMP_PATH):
+        """Writes report() to path as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+        print("Memory report written to", path)
+
+tracker = MemoryTracker(budget=assets.budget_from_env("DEATHTRIP_SURFACE_BUDGET_MB"),
+                        action=os.environ.get("DEATHTRIP_SURFACE_BUDGET_ACTION", "warn"))
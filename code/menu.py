@@ -1,36 +1,16 @@
 import pygame
 import sys
 import os
-from transition import FadeTransition  # Import the transition class
-
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_path, relative_path)
-
-pygame.init()
-
-# --- Config file functions ---
-def read_config():
-    # Check if config.txt exists; if not create one with default volume=1.0.
-    config_path = "config.txt"
-    if os.path.exists(config_path):
-        with open(config_path, "r") as f:
-            line = f.readline().strip()
-            try:
-                vol = float(line.split("=")[1])
-            except Exception as e:
-                vol = 1.0
-            return vol
-    else:
-        with open(config_path, "w") as f:
-            f.write("volume=1.0")
-        return 1.0
+import assets
+import display
+import widgets
+import fonts
+import savegame
+from profiling import startup
+from scenes import Scene, SceneManager
 
 # Screen settings
-SCREEN_WIDTH, SCREEN_HEIGHT = 1088, 612
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Deathtrip")
+SCREEN_WIDTH, SCREEN_HEIGHT = display.SCREEN_WIDTH, display.SCREEN_HEIGHT
 
 # Colors
 WHITE = (255, 255, 255)
@@ -38,197 +18,229 @@ GRAY = (200, 200, 200)
 DARK_GRAY = (150, 150, 150)
 BLACK = (0, 0, 0)
 
-# Fonts
-font = pygame.font.Font(None, 36)
+# The window and font; set by init().
+screen = None
+font = None
 
 # Define your target size for the logo display.
 target_width, target_height = 600, 300
 
-# Load the full square logo image.
-orig_logo = pygame.image.load(resource_path("images/logo.png")).convert_alpha()
-
-# Use the entire image rather than cropping.
-logo_content = orig_logo
-
-# Compute a scale factor so that the full image fits inside the target area.
-scale_factor = min(target_width / logo_content.get_width(), target_height / logo_content.get_height())
-scaled_width = int(logo_content.get_width() * scale_factor)
-scaled_height = int(logo_content.get_height() * scale_factor)
-
-# Scale the full logo while preserving the image.
-scaled_logo = pygame.transform.smoothscale(logo_content, (scaled_width, scaled_height))
-
-# Create a new surface with the target dimensions and a transparent background.
-logo_img = pygame.Surface((target_width, target_height), pygame.SRCALPHA)
-
-# Center the scaled logo on the new surface.
-x_offset = (target_width - scaled_width) // 2
-y_offset = (target_height - scaled_height) // 2
-logo_img.blit(scaled_logo, (x_offset, y_offset))
-
-# Load images
-button_box_img = pygame.image.load(resource_path("images/button_box.png")).convert_alpha()
-background_menu_img = pygame.image.load(resource_path("images/background_menu.png")).convert()
-background_menu_img = pygame.transform.scale(background_menu_img, (SCREEN_WIDTH, SCREEN_HEIGHT))
-
-# Read volume from config file
-config_volume = read_config()
-
-# Load button click sound and set volume (slider range is 0.0–5.0; scaled to 0.0–1.0)
-try:
-    button_click_sound = pygame.mixer.Sound(resource_path(os.path.join("sound", "button_click.wav")))
-    button_click_sound.set_volume(min(config_volume / 5.0, 1.0))
-except Exception as e:
-    print("Error loading sound:", e)
-    button_click_sound = None
-
-# AnimatedButton class that moves down/up and plays a sound effect
-class AnimatedButton:
-    def __init__(self, text, x, y, width, height, action):
-        self.text = text
-        self.base_rect = pygame.Rect(x, y, width, height)
-        self.rect = self.base_rect.copy()
-        self.action = action
-        self.hovered = False
-        self.pressed = False
-        self.press_offset = 5
-
-    def draw(self, screen):
-        scaled_img = pygame.transform.scale(button_box_img, (self.rect.width, self.rect.height))
-        screen.blit(scaled_img, (self.rect.x, self.rect.y))
-        text_surf = font.render(self.text, True, WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
-
-    def update(self):
-        if self.pressed:
-            self.rect.y = self.base_rect.y + self.press_offset
-        else:
-            self.rect.y = self.base_rect.y
+def build_logo(size):
+    target_width, target_height = size
+    # Scale the full square logo so it fits inside the target area, preserving the image.
+    scaled_logo = assets.load_image_fit("images/logo.png", (target_width, target_height), alpha=True, smooth=True,
+                                         owner="menu")
+    scaled_width, scaled_height = scaled_logo.get_size()
+
+    # Create a new surface with the target dimensions and a transparent background.
+    logo = pygame.Surface((target_width, target_height), pygame.SRCALPHA)
+
+    # Center the scaled logo on the new surface.
+    x_offset = (target_width - scaled_width) // 2
+    y_offset = (target_height - scaled_height) // 2
+    logo.blit(scaled_logo, (x_offset, y_offset))
+    return logo
+
+def logo_img():
+    """The logo, composited once per window resolution."""
+    size = display.size((target_width, target_height))
+    return assets.cached_surface(("menu_logo",) + size, lambda: build_logo(size), owner="menu")
+
+def background_menu_img():
+    return assets.load_image("images/background_menu.png", display.size((SCREEN_WIDTH, SCREEN_HEIGHT)), owner="menu")
+
+# AnimatedButton that moves down/up and plays a sound effect; init() sets its font and sound.
+class AnimatedButton(widgets.AnimatedButton):
+    owner = "menu"
+
+def init():
+    """
+    Opens the window and loads the menu's font, click sound and images. The menu
+    screens call it when they are created; only the first call does anything.
+
+    :return: The screen.
+    """
+    global screen, font
+    if screen is not None:
+        return screen
+    window = display.init()
+    with startup.step("menu"):
+        font = fonts.get_font(None, 36)
+        AnimatedButton.font = font
+        AnimatedButton.click_sound = widgets.click_sound()
+        logo_img()
+        background_menu_img()
+    screen = window
+    return screen
+
+# Chapter select: pick which scene the game starts from.
+class ChapterSelectScene(Scene):
+    def __init__(self):
+        init()
+        # The chapters (and their titles) come from the story script.
+        import game
+        self.scenes = [(game.STORY.scenes[scene_id].name, title) for scene_id, title in game.STORY.chapters]
+
+        # Create a button to go back to the main menu.
+        self.back_button = AnimatedButton("Tilbake", 20, SCREEN_HEIGHT - 60, 150, 50, self.go_back)
+
+        self.buttons = []
+        btn_width = 200
+        btn_height = 70
+        gap = 20
+        total_width = len(self.scenes) * btn_width + (len(self.scenes) - 1) * gap
+        start_x = (SCREEN_WIDTH - total_width) // 2
+        y = SCREEN_HEIGHT // 2 - btn_height // 2
+        for i, (scene_key, label) in enumerate(self.scenes):
+            btn_x = start_x + i * (btn_width + gap)
+            # On click: start game with chosen scene.
+            def make_action(key=scene_key):
+                return lambda: self.start_chapter(key)
+            self.buttons.append(AnimatedButton(label, btn_x, y, btn_width, btn_height, make_action()))
+
+    def go_back(self):
+        self.manager.pop(fade="crossfade")
+
+    def exit(self):
+        for btn in self.buttons:
+            btn.close()
+        self.back_button.close()
+
+    def start_chapter(self, key):
+        import game
+        self.manager.push_loading(lambda: game.Game(start_scene=key), game.load_job(key))
 
     def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.rect.collidepoint(event.pos):
-                self.pressed = True
-                if button_click_sound:
-                    button_click_sound.play()
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if self.pressed:
-                self.pressed = False
-                if self.rect.collidepoint(event.pos):
-                    self.action()
-
-# Helper function to perform a wipe transition before executing an action.
-def do_fade_transition(action):
-    pygame.event.clear()  # Clear pending events
-    fade_effect = FadeTransition(screen, speed=10, color=BLACK)
-    fade_effect.start()
-    clock = pygame.time.Clock()
-    triggered_action = False
-    while not fade_effect.done:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-        if fade_effect.phase == "fade_in":
-            screen.blit(background_menu_img, (0, 0))
-        if not triggered_action and fade_effect.phase == "fade_out":
-            action()  
-            triggered_action = True
-        fade_effect.update()
-        fade_effect.draw()
-        pygame.display.flip()
-        clock.tick(60)
-
-# Button actions using the transition helper
-def start_game():
-    import game
-    do_fade_transition(lambda: game.Game().run())
-
-def open_settings():
-    import settings
-    do_fade_transition(lambda: settings.settings_screen())
-
-# New function: Select Scene (Chapter)
-def select_scene():
-    # Define available scenes.
-    scenes = [
-        ("start", "Kapittel 1"),
-        ("scene_2", "Kapittel 2"),
-        ("scene_3", "Kapittel 3"),
-        ("scene_4", "Kapittel 4")
-    ]
-    running_scene = True
-
-    # Create a button to go back to the main menu.
-    def go_back():
-        nonlocal running_scene
-        running_scene = False
-
-    back_button = AnimatedButton("Tilbake", 20, SCREEN_HEIGHT - 60, 150, 50, go_back)
-
-    buttons = []
-    btn_width = 200
-    btn_height = 70
-    gap = 20
-    total_width = len(scenes) * btn_width + (len(scenes) - 1) * gap
-    start_x = (SCREEN_WIDTH - total_width) // 2
-    y = SCREEN_HEIGHT // 2 - btn_height // 2
-    for i, (scene_key, label) in enumerate(scenes):
-        btn_x = start_x + i * (btn_width + gap)
-        # On click: start game with chosen scene.
-        def make_action(key=scene_key):
-            return lambda: do_fade_transition(lambda: __import__("game").Game(start_scene=key).run())
-        buttons.append(AnimatedButton(label, btn_x, y, btn_width, btn_height, make_action()))
-
-    while running_scene:
-        screen.blit(background_menu_img, (0, 0))
-        for btn in buttons:
+        if event.type == pygame.QUIT:
+            self.manager.quit()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            self.go_back()
+        elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            for btn in self.buttons:
+                btn.handle_event(event)
+            self.back_button.handle_event(event)
+
+    def update(self, dt):
+        for btn in self.buttons:
             btn.update()
+        self.back_button.update()
+
+    def is_animating(self):
+        # Stay at full rate while a button is held down, otherwise sleep until input.
+        return self.back_button.pressed or any(btn.pressed for btn in self.buttons)
+
+    def draw(self, screen):
+        screen.blit(background_menu_img(), display.view)
+        for btn in self.buttons:
             btn.draw(screen)
-        back_button.update()
-        back_button.draw(screen)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                running_scene = False
-            elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
-                for btn in buttons:
-                    btn.handle_event(event)
-                back_button.handle_event(event)
-        pygame.display.flip()
-    do_fade_transition(run_menu)
-
-# Create main menu buttons.
-buttons = [
-    AnimatedButton("Start Spill", 35, SCREEN_HEIGHT - 240, 250, 70, start_game),
-    # Replace "Kapitel" button action with the new select_scene menu:
-    AnimatedButton("Kapittel", 55, SCREEN_HEIGHT - 160, 250, 70, lambda: do_fade_transition(select_scene)),
-    AnimatedButton("Innstillinger", 75, SCREEN_HEIGHT - 80, 250, 70, open_settings)
-]
-
-def run_menu():
-    running = True
-    while running:
-        screen.blit(background_menu_img, (0, 0))
+        self.back_button.draw(screen)
+
+class MenuScene(Scene):
+    def __init__(self):
+        init()
+        self.buttons = []
+        self.create_buttons()
+
+    def create_buttons(self):
+        for button in self.buttons:
+            button.close()
+        # Create main menu buttons.
+        self.buttons = [
+            AnimatedButton("Start Spill", 35, SCREEN_HEIGHT - 240, 250, 70, self.start_game),
+            AnimatedButton("Kapittel", 55, SCREEN_HEIGHT - 160, 250, 70, self.select_scene),
+            AnimatedButton("Innstillinger", 75, SCREEN_HEIGHT - 80, 250, 70, self.open_settings)
+        ]
+        # "Fortsett" continues a saved game; shown while there is one.
+        self.can_resume = savegame.store.has_save()
+        if self.can_resume:
+            self.buttons.insert(0, AnimatedButton("Fortsett", 15, SCREEN_HEIGHT - 320, 250, 70, self.resume_game))
+
+    # Button actions; each one fades over to the next scene.
+    def start_game(self):
+        import game
+        self.manager.push_loading(game.Game, game.load_job())
+
+    def resume_game(self):
+        import game
+        state = savegame.store.state
+        if state is None or state.get("scene") not in game.STORY.ids:
+            # The story changed since the game was saved.
+            savegame.store.clear()
+            self.start_game()
+            return
+        # Only the images of the saved scene and the scenes after it are loaded.
+        self.manager.push_loading(lambda: game.Game(resume=state), game.load_job(state["scene"]))
+
+    def select_scene(self):
+        self.manager.push(ChapterSelectScene(), fade="crossfade")
+
+    def open_settings(self):
+        import settings
+        self.manager.push(settings.SettingsScene(), fade="crossfade")
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.manager.quit()
+        elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+            for button in self.buttons:
+                button.handle_event(event)
+
+    def update(self, dt):
+        if self.can_resume != savegame.store.has_save():
+            # A game was saved or finished since the menu was shown.
+            self.create_buttons()
+            self.manager.scene_changed()
+        for button in self.buttons:
+            button.update()
+
+    def exit(self):
+        for button in self.buttons:
+            button.close()
+
+    def is_animating(self):
+        # Stay at full rate while a button is held down, otherwise sleep until input.
+        return any(button.pressed for button in self.buttons)
+
+    def draw(self, screen):
+        screen.blit(background_menu_img(), display.view)
         logo_x = -120
         logo_y = 20
-        screen.blit(logo_img, (logo_x, logo_y))
-        
-        for button in buttons:
-            button.update()
+        # The logo hangs off the left edge; keep it out of the bars around the logical area.
+        clip = screen.get_clip()
+        screen.set_clip(clip.clip(display.view))
+        screen.blit(logo_img(), display.point((logo_x, logo_y)))
+        screen.set_clip(clip)
+
+        for button in self.buttons:
             button.draw(screen)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
-                for button in buttons:
-                    button.handle_event(event)
-        pygame.display.flip()
+
+def run_menu(*extra_scenes):
+    """
+    Runs the game from the main menu until the window is closed.
+
+    :param extra_scenes: Scenes to open on top of the menu right away.
+    """
+    scheduler = None
+    if os.environ.get("DEATHTRIP_RECORD"):
+        import replay
+        scheduler = replay.RecordingScheduler(os.environ["DEATHTRIP_RECORD"])
+    if scheduler is None:
+        # Recordings start from the same menu every time, without "Fortsett".
+        savegame.store.open()
+    if os.environ.get("DEATHTRIP_ANALYTICS", "1") != "0":
+        import analytics
+        analytics.log.open()
+    manager = SceneManager(init(), fade_color=BLACK, scheduler=scheduler)
+    manager.push(MenuScene())
+    for scene in extra_scenes:
+        manager.push(scene)
+    try:
+        manager.run()
+    finally:
+        if scheduler is not None:
+            scheduler.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
-    run_menu()
\ No newline at end of file
+    run_menu()
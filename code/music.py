@@ -0,0 +1,154 @@
+"""
+Background music.
+
+One MusicPlayer (music.player) owns the music. Screens tell it which track
+should be playing when that changes (a new scene), never per frame, and it
+only calls into the mixer when the track, the volume or the pause state
+actually change.
+
+Tracks the player may need next are decoded on a background thread (preload),
+so switching tracks does not stall a frame on the disk. Tracks play as Sounds
+on two mixer channels reserved for music, so a new track fades in on one
+channel while the old one fades out on the other. Each track is decoded
+once: a track asked for while it is still being decoded starts as soon as
+its loader thread is done, instead of being decoded again on the frame.
+"""
+import threading
+import pygame
+import assets
+
+# Length (ms) of the crossfade when the track changes.
+FADE_MS = 800
+# Mixer channels 0 and 1 are kept for music; sound effects never take them.
+MUSIC_CHANNELS = 2
+
+class MusicPlayer:
+    def __init__(self):
+        self.sounds = {}        # Track path -> decoded pygame.mixer.Sound.
+        self.reading = set()    # Track paths being decoded on a background thread.
+        self.current = None     # The track that should be playing.
+        self.started = False    # Whether current is playing yet (it may still be decoding).
+        self.channel = 0        # Reserved channel the current track plays on.
+        self.paused = False
+        self.volume = 1.0
+        self._reserved = False
+        self._fade_in = False   # Fade the next track in; not the first one after stop().
+        self._lock = threading.Lock()   # Shared with the loader threads.
+
+    def _channel(self, index):
+        if not self._reserved:
+            pygame.mixer.set_reserved(MUSIC_CHANNELS)
+            self._reserved = True
+        return pygame.mixer.Channel(index)
+
+    def preload(self, paths):
+        """
+        Decodes the given tracks in the background and drops every other track
+        except the one playing.
+
+        :param paths: Track paths relative to the game folder, e.g. "sound/scene1.wav".
+        """
+        if not pygame.mixer.get_init():
+            return
+        paths = set(path for path in paths if path)
+        with self._lock:
+            for path in list(self.sounds):
+                if path not in paths and path != self.current:
+                    del self.sounds[path]
+            for path in paths - set(self.sounds) - self.reading:
+                self.reading.add(path)
+                threading.Thread(target=self._read, args=(path,), name="music-loader", daemon=True).start()
+
+    def _read(self, path):
+        try:
+            sound = self._load(path)
+        except (OSError, pygame.error) as e:
+            print("Error loading music:", path, e)
+            sound = None
+        with self._lock:
+            self.reading.discard(path)
+            if sound is None:
+                return
+            # Keep the Sound that is cached already; it may be the one playing.
+            sound = self.sounds.setdefault(path, sound)
+            if path == self.current and not self.started:
+                self._start(sound)
+
+    def _load(self, path):
+        sound = pygame.mixer.Sound(assets.resource_path(path))
+        sound.set_volume(self.volume)
+        return sound
+
+    def play(self, path):
+        """Makes path the looping track, crossfading from the current one; a no-op if it already plays."""
+        if not path or path == self.current or not pygame.mixer.get_init():
+            return
+        with self._lock:
+            self.current = path
+            sound = self.sounds.get(path)
+            if sound is None and path in self.reading:
+                # Its loader thread starts it once it is decoded.
+                self._fade_out()
+                return
+        if sound is None:
+            # Not preloaded: load it now.
+            try:
+                sound = self._load(path)
+            except (OSError, pygame.error) as e:
+                print("Error loading music:", path, e)
+                return
+        with self._lock:
+            sound = self.sounds.setdefault(path, sound)
+            if path == self.current:
+                self._start(sound)
+
+    def _fade_out(self):
+        if self.started:
+            self._channel(self.channel).fadeout(FADE_MS)
+            self.channel = 1 - self.channel
+            self.started = False
+
+    def _start(self, sound):
+        # Called with self._lock held.
+        self._fade_out()
+        sound.set_volume(self.volume)
+        channel = self._channel(self.channel)
+        channel.play(sound, loops=-1, fade_ms=FADE_MS if self._fade_in else 0)
+        if self.paused:
+            channel.pause()
+        self.started = True
+        self._fade_in = True
+
+    def set_paused(self, paused):
+        if paused == self.paused:
+            return
+        self.paused = paused
+        if not pygame.mixer.get_init():
+            return
+        for index in range(MUSIC_CHANNELS):
+            if paused:
+                self._channel(index).pause()
+            else:
+                self._channel(index).unpause()
+
+    def set_volume(self, volume):
+        """:param volume: 0.0 to 1.0."""
+        if volume == self.volume:
+            return
+        with self._lock:
+            self.volume = volume
+            # The volume of the Sounds, so it does not fight the channels' fades.
+            for sound in self.sounds.values():
+                sound.set_volume(volume)
+
+    def stop(self):
+        with self._lock:
+            if pygame.mixer.get_init():
+                for index in range(MUSIC_CHANNELS):
+                    self._channel(index).stop()
+            self.current = None
+            self.started = False
+            self._fade_in = False
+            self.paused = False
+
+player = MusicPlayer()
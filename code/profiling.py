@@ -0,0 +1,254 @@
+"""
+Frame profiler: named timing zones, a rolling history of recent frames, an
+on-screen frame-time graph and a JSON dump of the statistics.
+
+    from profiling import profiler
+    with profiler.zone("draw"):
+        ...
+
+SceneManager times waiting, event handling, update, draw and flip for every
+screen, and Game adds zones inside its update. F3 turns the profiler and its
+overlay on and off, F4 writes the statistics to DUMP_PATH. Set
+DEATHTRIP_PROFILE=1 to start with it on.
+
+While it is off, zone() hands back one shared no-op context manager and
+end_frame() returns at once, so the hooks can stay in release builds.
+
+The startup tracer (profiling.startup) times the steps of launching the game
+once: opening the window, loading each screen's assets, compiling the story.
+Set DEATHTRIP_TRACE_STARTUP=1 to print them when the first frame is shown.
+"""
+import os
+import math
+import json
+import time
+import contextlib
+from collections import deque
+import pygame
+import fonts
+
+# Frames kept for the graph and the statistics.
+HISTORY = 240
+TOGGLE_KEY = pygame.K_F3
+DUMP_KEY = pygame.K_F4
+DUMP_PATH = os.environ.get("DEATHTRIP_PROFILE_FILE", "frame_profile.json")
+
+# Top-level zones, stacked in this order in the graph. Nested zones (e.g.
+# Game's "prefetch" inside "update") only show up in the statistics.
+ZONE_COLORS = {
+    "events": (90, 160, 255),
+    "update": (80, 200, 120),
+    "draw": (240, 190, 60),
+    "transition": (180, 110, 230),
+    "flip": (230, 90, 90),
+}
+GRAPH_MS = 33.3     # Frame time at the top of the graph.
+FRAME_BUDGET_MS = 1000 / 60
+PANEL_SIZE = (HISTORY + 20, 160)
+TEXT_COLOR = (230, 230, 230)
+
+class _NullZone:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_ZONE = _NullZone()
+
+class Zone:
+    """Adds the time spent inside a with block to the current frame's total for its name."""
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        totals = self.profiler.current
+        totals[self.name] = totals.get(self.name, 0) + (time.perf_counter() - self.start) * 1000
+        return False
+
+def percentile(values, pct):
+    """Nearest-rank percentile; every tool reports with this one, so their numbers compare."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+class Profiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.zones = {}
+        self.current = {}   # Zone name -> ms in the frame being measured.
+        self.history = deque(maxlen=HISTORY)   # (frame ms, {zone: ms}) per finished frame.
+        self.frame_start = None
+        self.font = None
+
+    def zone(self, name):
+        """Context manager timing a block under name; a no-op while the profiler is off."""
+        if not self.enabled:
+            return _NULL_ZONE
+        zone = self.zones.get(name)
+        if zone is None:
+            zone = self.zones[name] = Zone(self, name)
+        return zone
+
+    def end_frame(self):
+        """Closes the current frame; call once per pass of a main loop."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.history.append(((now - self.frame_start) * 1000, self.current))
+        self.current = {}
+        self.frame_start = now
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.history.clear()
+        self.current = {}
+        self.frame_start = None
+
+    def handle_event(self, event):
+        """Handles the profiler's keys; returns True if the event was one of them."""
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == TOGGLE_KEY:
+            self.toggle()
+            return True
+        if event.key == DUMP_KEY and self.enabled:
+            self.dump()
+            return True
+        return False
+
+    def stats(self):
+        """Mean, p50, p95 and max in ms over the history, for whole frames and each zone."""
+        series = {"frame": [frame_ms for frame_ms, _ in self.history]}
+        for _, zones in self.history:
+            for name in zones:
+                series.setdefault(name, [])
+        for name in series:
+            if name != "frame":
+                series[name] = [zones.get(name, 0) for _, zones in self.history]
+        return {name: {
+            "mean": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50": round(percentile(values, 50), 3),
+            "p95": round(percentile(values, 95), 3),
+            "max": round(max(values, default=0.0), 3),
+        } for name, values in series.items()}
+
+    def dump(self, path=DUMP_PATH):
+        """Writes the statistics and the frames they come from to path as JSON."""
+        report = {
+            "frames": len(self.history),
+            "stats": self.stats(),
+            "history": [{"frame": round(frame_ms, 3), **{name: round(ms, 3) for name, ms in zones.items()}}
+                        for frame_ms, zones in self.history],
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+        print("Frame profile written to", path)
+
+    def draw(self, screen):
+        """
+        Draws the overlay in the top right corner while the profiler is on.
+
+        :return: The rect drawn over, or None.
+        """
+        if not self.enabled:
+            return None
+        if self.font is None:
+            self.font = fonts.get_font(None, 18)
+        text = fonts.atlas(self.font, TEXT_COLOR)
+        panel = pygame.Rect(0, 0, *PANEL_SIZE)
+        panel.topright = (screen.get_width() - 10, 10)
+        screen.fill((20, 20, 20), panel)
+
+        # One column per frame: the top-level zones stacked bottom up.
+        graph = pygame.Rect(panel.x + 10, panel.y + 10, HISTORY, 80)
+        scale = graph.height / GRAPH_MS
+        x = graph.right - len(self.history)
+        for _, zones in self.history:
+            y = graph.bottom
+            for name, color in ZONE_COLORS.items():
+                height = min(y - graph.top, round(zones.get(name, 0) * scale))
+                if height > 0:
+                    y -= height
+                    screen.fill(color, (x, y, 1, height))
+            x += 1
+        budget_y = graph.bottom - round(FRAME_BUDGET_MS * scale)
+        screen.fill((120, 120, 120), (graph.x, budget_y, graph.width, 1))
+
+        stats = self.stats()
+        y = graph.bottom + 6
+        text.draw(screen, "frame p50 %.1f p95 %.1f max %.1f ms" % (
+            stats["frame"]["p50"], stats["frame"]["p95"], stats["frame"]["max"]), (graph.x, y))
+        x = graph.x
+        y += 18
+        for name, color in ZONE_COLORS.items():
+            if name in stats:
+                label = "%s %.1f" % (name, stats[name]["mean"])
+                if x + 11 + text.width(label) > graph.right:
+                    x = graph.x
+                    y += 18
+                screen.fill(color, (x, y + 3, 8, 8))
+                x = text.draw(screen, label, (x + 11, y)) + 8
+        return panel
+
+profiler = Profiler(enabled=os.environ.get("DEATHTRIP_PROFILE") == "1")
+
+class StartupTracer:
+    """
+    Records how long each step of starting the game takes, from the import of
+    this module to the first frame on screen. Steps can nest (e.g. "window"
+    inside "menu").
+    """
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.origin = time.perf_counter()
+        self.steps = []     # [name, depth, start ms, ms] in the order the steps started.
+        self.depth = 0
+        self.first_frame_ms = None
+
+    @contextlib.contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        record = [name, self.depth, (start - self.origin) * 1000, None]
+        self.steps.append(record)
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+            record[3] = (time.perf_counter() - start) * 1000
+
+    def first_frame(self):
+        """Marks the first frame as shown; SceneManager calls it after every frame, only the first counts."""
+        if self.first_frame_ms is not None:
+            return
+        self.first_frame_ms = (time.perf_counter() - self.origin) * 1000
+        if self.verbose:
+            print(self.report())
+
+    def as_dict(self):
+        return {
+            "first_frame_ms": round(self.first_frame_ms, 3) if self.first_frame_ms is not None else None,
+            "steps": [{"name": name, "depth": depth, "start_ms": round(start, 3),
+                       "ms": round(ms, 3) if ms is not None else None}
+                      for name, depth, start, ms in self.steps],
+        }
+
+    def report(self):
+        lines = ["Startup (ms since launch):"]
+        for name, depth, start, ms in self.steps:
+            duration = "running" if ms is None else f"{ms:8.1f} ms"
+            lines.append(f"  {start:8.1f}  {'  ' * depth}{name:<{28 - 2 * depth}} {duration}")
+        if self.first_frame_ms is not None:
+            lines.append(f"  {self.first_frame_ms:8.1f}  first frame")
+        return "\n".join(lines)
+
+startup = StartupTracer(verbose=os.environ.get("DEATHTRIP_TRACE_STARTUP") == "1")
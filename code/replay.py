@@ -0,0 +1,237 @@
+"""
+Input recording and deterministic replay.
+
+A recording holds, for every pass of SceneManager's main loop, the frame's dt,
+its input events and whether a background load finished on that frame, in a
+compact binary log. Replaying feeds exactly that back through the same loop,
+so a session plays out the same way every time, on any machine, headless or
+not, and its frame times can be compared between builds.
+
+    python code/replay.py record session.dtrec
+    python code/replay.py play session.dtrec [--speed full|recorded] [--headless] [--output times.json]
+
+Setting DEATHTRIP_RECORD=<path> records every session of the normal game too.
+
+Log format: MAGIC, then one FRAME record per frame (dt in ms, flags, event
+count) followed by its events, each a type byte and that type's fields.
+"""
+import os
+import json
+import time
+import struct
+import argparse
+import pygame
+from scheduler import FrameScheduler
+
+MAGIC = b"DTREC1\n"
+FRAME = struct.Struct("<dBH")          # dt, flags, number of events
+MOTION = struct.Struct("<hhhhB")       # x, y, rel x, rel y, buttons held (bit mask)
+BUTTON = struct.Struct("<hhB")         # x, y, button
+KEY = struct.Struct("<iHHB")           # key, mod, scancode, length of the UTF-8 unicode text
+
+# Frame flags.
+LOAD_FINISHED = 1   # SceneManager's background load completed on this frame.
+
+# Events the game reacts to, by their code in the log. Anything else (focus,
+# audio devices, ...) does not change what the game does and is not recorded.
+EVENT_TYPES = [
+    pygame.QUIT,
+    pygame.KEYDOWN,
+    pygame.KEYUP,
+    pygame.MOUSEMOTION,
+    pygame.MOUSEBUTTONDOWN,
+    pygame.MOUSEBUTTONUP,
+    pygame.VIDEOEXPOSE,
+    pygame.WINDOWEXPOSED,
+]
+EVENT_CODES = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+
+def encode_event(event):
+    """Returns the event's bytes in the log, or None for events that are not recorded."""
+    code = EVENT_CODES.get(event.type)
+    if code is None:
+        return None
+    data = bytes([code])
+    if event.type == pygame.MOUSEMOTION:
+        buttons = sum(1 << i for i, held in enumerate(event.buttons) if held)
+        data += MOTION.pack(*event.pos, *event.rel, buttons)
+    elif event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        data += BUTTON.pack(*event.pos, event.button)
+    elif event.type in (pygame.KEYDOWN, pygame.KEYUP):
+        text = getattr(event, "unicode", "").encode("utf-8")[:255]
+        data += KEY.pack(event.key, event.mod, getattr(event, "scancode", 0), len(text)) + text
+    return data
+
+def decode_event(data, offset):
+    """Reads one event at offset; returns (event, offset after it)."""
+    event_type = EVENT_TYPES[data[offset]]
+    offset += 1
+    if event_type == pygame.MOUSEMOTION:
+        x, y, rel_x, rel_y, buttons = MOTION.unpack_from(data, offset)
+        offset += MOTION.size
+        attributes = {"pos": (x, y), "rel": (rel_x, rel_y),
+                      "buttons": tuple(bool(buttons & (1 << i)) for i in range(3))}
+    elif event_type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+        x, y, button = BUTTON.unpack_from(data, offset)
+        offset += BUTTON.size
+        attributes = {"pos": (x, y), "button": button}
+    elif event_type in (pygame.KEYDOWN, pygame.KEYUP):
+        key, mod, scancode, length = KEY.unpack_from(data, offset)
+        offset += KEY.size
+        text = data[offset:offset + length].decode("utf-8")
+        offset += length
+        attributes = {"key": key, "mod": mod, "scancode": scancode, "unicode": text}
+    else:
+        attributes = {}
+    return pygame.event.Event(event_type, attributes), offset
+
+def read_log(path):
+    """Returns the recorded frames as (dt, flags, events) tuples."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not an input recording")
+    frames = []
+    offset = len(MAGIC)
+    while offset < len(data):
+        dt, flags, count = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        events = []
+        for _ in range(count):
+            event, offset = decode_event(data, offset)
+            events.append(event)
+        frames.append((dt, flags, events))
+    return frames
+
+class RecordingScheduler(FrameScheduler):
+    """Paces frames like FrameScheduler and writes each frame's dt and events to a log."""
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.pending = None     # The current frame; written once its flags are known.
+
+    def next_frame(self):
+        self.write_pending()
+        dt, events = super().next_frame()
+        self.pending = [dt, 0, [data for data in map(encode_event, events) if data is not None]]
+        return dt, events
+
+    def finish_load(self, job, time_budget):
+        finished = super().finish_load(job, time_budget)
+        if finished and self.pending is not None:
+            self.pending[1] |= LOAD_FINISHED
+        return finished
+
+    def write_pending(self):
+        if self.pending is not None:
+            dt, flags, events = self.pending
+            self.file.write(FRAME.pack(dt, flags, len(events)) + b"".join(events))
+            self.pending = None
+
+    def close(self):
+        if not self.file.closed:
+            self.write_pending()
+            self.file.close()
+
+class ReplayScheduler(FrameScheduler):
+    """
+    Feeds recorded frames to SceneManager instead of waiting for input.
+
+    Background loads finish on exactly the recorded frames (waiting for them if
+    this machine is slower), so the game state matches the recording frame for
+    frame. Records how long each frame took to run.
+    """
+    def __init__(self, frames, speed="full"):
+        """
+        :param frames: From read_log().
+        :param speed: "full" runs frames back to back, "recorded" keeps the recorded pace.
+        """
+        super().__init__()
+        self.frames = frames
+        self.speed = speed
+        self.manager = None     # Set by the caller; quit when the log runs out.
+        self.index = 0
+        self.flags = 0
+        self.frame_times = []
+        self._frame_start = None
+        self._deadline = None
+
+    def next_frame(self):
+        now = time.perf_counter()
+        if self._frame_start is not None:
+            self.frame_times.append((now - self._frame_start) * 1000)
+        pygame.event.pump()  # Keep the window responsive; live input is ignored.
+        if self.index >= len(self.frames):
+            self.manager.quit()
+            return 0, []
+        dt, self.flags, events = self.frames[self.index]
+        self.index += 1
+        if self.speed == "recorded":
+            self._deadline = (self._deadline or now) + dt / 1000
+            time.sleep(max(0, self._deadline - time.perf_counter()))
+        self._frame_start = time.perf_counter()
+        return dt, events
+
+    def finish_load(self, job, time_budget):
+        if self.flags & LOAD_FINISHED:
+            return job.finish()
+        return False
+
+def summary(frame_times):
+    from profiling import percentile
+    return {
+        "frames": len(frame_times),
+        "total_ms": round(sum(frame_times), 3),
+        "frame_ms": {
+            "p50": round(percentile(frame_times, 50), 4),
+            "p95": round(percentile(frame_times, 95), 4),
+            "p99": round(percentile(frame_times, 99), 4),
+            "max": round(max(frame_times, default=0.0), 4),
+        },
+    }
+
+def run(scheduler):
+    """Runs the game from the main menu with scheduler until the stack is empty."""
+    import menu
+    from scenes import SceneManager
+    manager = SceneManager(menu.init(), fade_color=menu.BLACK, scheduler=scheduler)
+    scheduler.manager = manager
+    manager.push(menu.MenuScene())
+    manager.run()
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay Deathtrip input.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="play the game and record the input")
+    record.add_argument("path")
+    play = commands.add_parser("play", help="replay a recording")
+    play.add_argument("path")
+    play.add_argument("--speed", choices=("full", "recorded"), default="full")
+    play.add_argument("--headless", action="store_true", help="use the SDL dummy video and audio drivers")
+    play.add_argument("--output", help="write the frame times summary here as JSON")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        scheduler = RecordingScheduler(args.path)
+        try:
+            run(scheduler)
+        finally:
+            scheduler.close()
+        print(f"Recorded {args.path}")
+        return
+
+    if args.headless:
+        # Read when the display is opened, which happens when run() creates the menu.
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    scheduler = ReplayScheduler(read_log(args.path), speed=args.speed)
+    run(scheduler)
+    report = summary(scheduler.frame_times)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
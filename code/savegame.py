@@ -0,0 +1,116 @@
+"""
+Save and resume: a snapshot of the running Game, so a reboot or a closed
+window does not send the player back to the start of the story.
+
+Game takes a snapshot (Game.snapshot) whenever the player moves on to the next
+line or page or makes a decision, and when it is closed. The store keeps the
+latest one in memory and a background thread writes it to SAVE_PATH, so the
+frame loop never waits for the disk. Snapshots that arrive while one is being
+written replace each other; only the newest is written. Reaching an ending
+deletes the save.
+
+The menu shows "Fortsett" while there is a save. Nothing is saved or shown
+until open() is called (see menu.run_menu), so tools that play the game
+headlessly neither read nor write it.
+"""
+import os
+import json
+import atexit
+import threading
+
+SAVE_PATH = os.environ.get("DEATHTRIP_SAVE_FILE", "savegame.json")
+# Bumped when the snapshot's fields change; older saves are ignored.
+VERSION = 1
+
+_DELETE = object()
+
+class SaveStore:
+    def __init__(self, path=SAVE_PATH):
+        self.path = path
+        self.enabled = False
+        self.state = None       # The latest snapshot, or None if there is no save.
+        self._pending = None    # Snapshot (or _DELETE) waiting for the writer.
+        self._closing = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def open(self):
+        """Reads the save from disk once and starts the writer thread."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self.state = self._read()
+        self._thread = threading.Thread(target=self._write_loop, name="save-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("version") != VERSION:
+            return None
+        return state
+
+    def has_save(self):
+        return self.enabled and self.state is not None
+
+    def save(self, state):
+        """Replaces the save with state (a dict from Game.snapshot); written in the background."""
+        if not self.enabled:
+            return
+        state["version"] = VERSION
+        self.state = state
+        self._queue(state)
+
+    def clear(self):
+        """Deletes the save, e.g. once the story reached an ending."""
+        if not self.enabled or self.state is None:
+            return
+        self.state = None
+        self._queue(_DELETE)
+
+    def _queue(self, item):
+        with self._lock:
+            self._pending = item
+        self._wake.set()
+
+    def close(self):
+        """Writes the last snapshot and stops the writer thread."""
+        if self._thread is None:
+            return
+        self._closing = True
+        self._wake.set()
+        self._thread.join(2.0)
+        self._thread = None
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                item, self._pending = self._pending, None
+            try:
+                if item is _DELETE:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                elif item is not None:
+                    self._write(item)
+            except Exception as e:
+                # Keep the thread alive; the next snapshot is written as usual.
+                print("Error writing save:", e)
+            if self._closing and self._pending is None:
+                return
+
+    def _write(self, state):
+        # Written next to the save and renamed over it, so a reboot mid-write
+        # leaves the previous save rather than a truncated one.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+store = SaveStore()
@@ -0,0 +1,239 @@
+import pygame
+import assets
+import display
+import transition
+import memory
+from scheduler import FrameScheduler
+from profiling import profiler, startup
+
+# Milliseconds per frame spent converting images from a background load, so
+# the fade keeps running smoothly while they arrive.
+LOAD_BUDGET = 8
+
+class Scene:
+    """
+    A screen run by SceneManager (the menu, chapter select, settings, Game).
+
+    The manager owns the only main loop; scenes just react to events, advance
+    their state and draw. self.manager is set when the scene is pushed. Events
+    arrive in logical coordinates; draw through display.point/size/rect.
+    """
+    manager = None
+
+    def enter(self):
+        """Called when the scene is pushed onto the stack."""
+
+    def exit(self):
+        """Called when the scene is removed from the stack; release subscriptions here."""
+
+    def handle_event(self, event):
+        pass
+
+    def update(self, dt):
+        pass
+
+    def is_animating(self):
+        """True while the scene needs frames without input (see FrameScheduler)."""
+        return False
+
+    def draw(self, screen):
+        """Draws the whole scene."""
+
+    def render(self, screen):
+        """
+        Draws whatever changed since the last frame.
+
+        :return: A list of rects to push with pygame.display.update, or None to flip the whole frame.
+        """
+        self.draw(screen)
+        return None
+
+    def invalidate(self):
+        """Forgets what is on screen, so the next render() draws everything."""
+
+def logical_event(event):
+    """event with its mouse position mapped to logical coordinates (see display.py)."""
+    if (display.scale == 1 and display.view.topleft == (0, 0)) or not hasattr(event, "pos"):
+        return event
+    return pygame.event.Event(event.type, {**event.dict, "pos": display.to_logical(event.pos)})
+
+class SceneManager:
+    """
+    Single main loop over a stack of scenes, with transitions between them.
+
+    push, pop and replace take fade=True for a fade through fade_color, or the
+    name of another transition (see transition.TRANSITIONS), e.g. "crossfade".
+    """
+    def __init__(self, screen, fps=60, fade_duration=transition.DURATION, fade_color=(0, 0, 0),
+                 scheduler=None):
+        """
+        :param fade_duration: Length (ms) of each half of a transition.
+        :param scheduler: Frame pacing; defaults to a FrameScheduler at fps (tools pass scripted ones).
+        """
+        self.screen = screen
+        self.scheduler = scheduler or FrameScheduler(fps=fps)
+        self.fade_duration = fade_duration
+        self.fade_color = fade_color
+        self.stack = []
+        self.transition = None
+        self.pending_change = None
+        self.loading = None  # assets.LoadJob the current fade is waiting for.
+
+    def top(self):
+        return self.stack[-1] if self.stack else None
+
+    def push(self, scene, fade=False):
+        if fade:
+            return self.fade(lambda: self.push(scene), fade)
+        scene.manager = self
+        self.stack.append(scene)
+        scene.enter()
+        self.scene_changed()
+
+    def pop(self, fade=False):
+        if fade:
+            return self.fade(self.pop, fade)
+        if self.stack:
+            scene = self.stack.pop()
+            scene.exit()
+            scene.manager = None
+        self.scene_changed()
+
+    def replace(self, scene, fade=False):
+        if fade:
+            return self.fade(lambda: self.replace(scene), fade)
+        self.pop()
+        self.push(scene)
+
+    def push_loading(self, make_scene, job):
+        """
+        Fades out while job loads in the background, then pushes make_scene().
+
+        The fade holds at full black with a progress bar until everything is
+        loaded, so the new scene's first frame never waits for the disk.
+
+        :param make_scene: Called without arguments to create the scene once the assets are cached.
+        :param job: The assets.LoadJob loading what the scene needs.
+        """
+        if self.transition is not None:
+            return
+        self.loading = job
+        self.fade(lambda: self.push(make_scene()))
+
+    def quit(self):
+        """Removes every scene, which ends run()."""
+        while self.stack:
+            self.pop()
+        self.transition = None
+        self.pending_change = None
+        self.loading = None
+
+    def fade(self, change, style=True):
+        """
+        Fades to black over the current scene, applies change() and fades the new top scene in.
+
+        :param style: True for the fade, or the name of another transition.
+        """
+        if self.transition is not None:
+            return  # Ignore double clicks while a fade is already running.
+        pygame.event.clear()  # Clear pending events
+        # Anything but a fade through black would show the half loaded scene.
+        name = "fade" if style is True or self.loading is not None else style
+        self.transition = transition.create(name, self.screen, duration=self.fade_duration,
+                                            color=self.fade_color)
+        self.pending_change = change
+
+    def scene_changed(self):
+        top = self.top()
+        if top is not None:
+            top.invalidate()
+        self.scheduler.request_redraw()
+
+    def run(self):
+        """Runs until the stack is empty."""
+        while self.stack:
+            profiler.end_frame()
+            memory.tracker.end_frame()
+            with profiler.zone("wait"):
+                dt, events = self.scheduler.next_frame()
+            with profiler.zone("events"):
+                for event in events:
+                    if not self.stack:
+                        break
+                    if profiler.handle_event(event):
+                        self.scene_changed()  # Draw over (or clear away) the overlay.
+                        continue
+                    if memory.tracker.handle_event(event):
+                        continue
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                        self.scene_changed()
+                    elif event.type == pygame.VIDEORESIZE:
+                        # Images and fonts for the new size are loaded (once) as the screens draw.
+                        if display.resize():
+                            assets.clear()
+                        self.scene_changed()
+                        continue
+                    event = logical_event(event)
+                    if self.transition is None:
+                        self.top().handle_event(event)
+                    elif event.type == pygame.QUIT:
+                        self.quit()
+            if not self.stack:
+                break
+            with profiler.zone("update"):
+                self.top().update(dt)
+            if self.transition is not None:
+                with profiler.zone("transition"):
+                    self.draw_transition(dt)
+            else:
+                top = self.top()
+                if top is None:
+                    break
+                self.scheduler.animating = top.is_animating()
+                if self.scheduler.needs_redraw(events):
+                    with profiler.zone("draw"):
+                        rects = top.render(self.screen)
+                        overlay = profiler.draw(self.screen)
+                    if overlay is not None and rects is not None:
+                        rects = rects + [overlay]
+                    with profiler.zone("flip"):
+                        if rects is None:
+                            pygame.display.flip()
+                        elif rects:
+                            pygame.display.update(rects)
+            startup.first_frame()
+
+    def draw_transition(self, dt):
+        self.scheduler.animating = True
+        if self.loading is not None:
+            with profiler.zone("loading"):
+                finished = self.scheduler.finish_load(self.loading, LOAD_BUDGET)
+            if finished:
+                self.loading = None
+            elif self.transition.phase == "fade_out":
+                self.draw_loading()  # Hold at black until the load is done.
+                return
+        if self.pending_change is not None and self.transition.phase == "fade_out":
+            change, self.pending_change = self.pending_change, None
+            change()
+            if not self.stack:
+                return
+        self.transition.update(dt)
+        self.top().draw(self.screen)
+        self.transition.draw()
+        profiler.draw(self.screen)
+        pygame.display.flip()
+        if self.transition.done:
+            self.transition = None
+            self.scene_changed()
+
+    def draw_loading(self):
+        """Loading screen: the faded-out frame with a progress bar."""
+        self.screen.fill(self.fade_color)
+        bar = pygame.Rect(0, 0, 300, 6)
+        bar.center = (self.screen.get_width() // 2, self.screen.get_height() - 60)
+        self.screen.fill((60, 60, 60), bar)
+        bar.width = int(bar.width * self.loading.progress())
+        self.screen.fill((200, 200, 200), bar)
+        profiler.draw(self.screen)
+        pygame.display.flip()
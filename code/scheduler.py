@@ -0,0 +1,53 @@
+import pygame
+
+class FrameScheduler:
+    """
+    Paces a screen loop: full frame rate while something is animating,
+    otherwise the loop sleeps in pygame.event.wait until input arrives.
+    """
+    def __init__(self, fps=60, idle_timeout=250):
+        """
+        :param fps: Frame rate while animating.
+        :param idle_timeout: Longest time (ms) to block waiting for input when idle.
+        """
+        self.fps = fps
+        self.idle_timeout = idle_timeout
+        self.clock = pygame.time.Clock()
+        # Set by the screen every frame; True while typewriter text, a pressed
+        # button or a fade needs the next frame regardless of input.
+        self.animating = False
+        self.redraw_requested = True  # The first frame is always drawn.
+
+    def next_frame(self):
+        """
+        Waits until the next frame should run.
+
+        :return: (dt, events) where dt is the animation time step in ms. Frames that
+                 follow an idle wait get dt 0, since nothing was moving while we slept.
+        """
+        if self.animating:
+            dt = self.clock.tick(self.fps)
+            return dt, pygame.event.get()
+        event = pygame.event.wait(self.idle_timeout)
+        events = [] if event.type == pygame.NOEVENT else [event]
+        events.extend(pygame.event.get())
+        self.clock.tick()
+        return 0, events
+
+    def finish_load(self, job, time_budget):
+        """
+        Lets a background load store what it has within time_budget ms; returns True once it is done.
+
+        Loads are the only thing in the loop that depends on wall clock time
+        rather than dt, so replays (see replay.py) decide here when they finish.
+        """
+        return job.finish(time_budget)
+
+    def request_redraw(self):
+        self.redraw_requested = True
+
+    def needs_redraw(self, events):
+        """True when the frame has to be drawn: something moved, input arrived or a redraw was requested."""
+        redraw = self.animating or bool(events) or self.redraw_requested
+        self.redraw_requested = False
+        return redraw
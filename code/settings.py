@@ -1,115 +1,50 @@
-import sys, os
 import pygame
-import sys
-import os
-from menu import do_fade_transition, run_menu
-
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_path, relative_path)
-
-pygame.init()
+import assets
+import config
+import display
+import widgets
+import fonts
+import music
+from profiling import startup
+from scenes import Scene
 
 # Screen settings
-SCREEN_WIDTH, SCREEN_HEIGHT = 1088, 612
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+SCREEN_WIDTH, SCREEN_HEIGHT = display.SCREEN_WIDTH, display.SCREEN_HEIGHT
 
-# Colors and font
+# Colors
 WHITE = (255, 255, 255)
 GRAY = (200, 200, 200)
 DARK_GRAY = (150, 150, 150)
 BLACK = (0, 0, 0)
-font = pygame.font.Font(None, 36)
-
-# --- Config file functions ---
-def read_config():
-    # Check if config.txt exists; if not create one with default volume=1.0.
-    config_path = "config.txt"
-    if os.path.exists(config_path):
-        with open(config_path, "r") as f:
-            line = f.readline().strip()
-            try:
-                vol = float(line.split("=")[1])
-            except Exception as e:
-                vol = 1.0
-            return vol
-    else:
-        with open(config_path, "w") as f:
-            f.write("volume=1.0")
-        return 1.0
-
-def update_config(new_value):
-    config_path = "config.txt"
-    with open(config_path, "w") as f:
-        f.write("volume=" + str(new_value))
-
-# --- Music config file functions ---
-def read_music_config():
-    config_path = "music_config.txt"
-    if os.path.exists(config_path):
-        with open(config_path, "r") as f:
-            line = f.readline().strip()
-            try:
-                mvol = float(line.split("=")[1])
-            except Exception as e:
-                mvol = 1.0
-            return mvol
-    else:
-        with open(config_path, "w") as f:
-            f.write("music_volume=1.0")
-        return 1.0
-
-def update_music_config(new_value):
-    config_path = "music_config.txt"
-    with open(config_path, "w") as f:
-        f.write("music_volume=" + str(new_value))
-
-# Load the button click sound from the "sound" folder using try/except
-try:
-    button_click_sound = pygame.mixer.Sound(resource_path("sound/button_click.wav"))
-    # Set volume using the config value (scaled to 0.0-1.0)
-    config_volume = read_config()
-    button_click_sound.set_volume(min(config_volume / 5.0, 1.0))
-except Exception as e:
-    print("Error loading sound:", e)
-    button_click_sound = None
-
-# Animated button that moves down/up on click and plays sound
-class AnimatedButton:
-    def __init__(self, text, x, y, width, height, action):
-        self.text = text
-        self.base_rect = pygame.Rect(x, y, width, height)
-        self.rect = self.base_rect.copy()
-        self.action = action
-        self.hovered = False
-        self.pressed = False
-        self.press_offset = 5  # How many pixels to move down when pressed
-
-    def draw(self, surface):
-        pygame.draw.rect(surface, DARK_GRAY, self.rect)
-        pygame.draw.rect(surface, WHITE, self.rect, 2)
-        text_surf = font.render(self.text, True, WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        surface.blit(text_surf, text_rect)
-
-    def update(self):
-        if self.pressed:
-            self.rect.y = self.base_rect.y + self.press_offset
-        else:
-            self.rect.y = self.base_rect.y
 
-    def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.rect.collidepoint(event.pos):
-                self.pressed = True
-                if button_click_sound:
-                    button_click_sound.play()
-        elif event.type == pygame.MOUSEBUTTONUP:
-            if self.pressed:
-                self.pressed = False
-                if self.rect.collidepoint(event.pos):
-                    self.action()
+# Set by init().
+font = None
+
+# Animated button that moves down/up on click and plays sound; init() sets its font and sound.
+class AnimatedButton(widgets.AnimatedButton):
+    owner = "settings"
+
+    def draw_skin(self, surface):
+        rect = display.rect(self.rect)
+        pygame.draw.rect(surface, DARK_GRAY, rect)
+        pygame.draw.rect(surface, WHITE, rect, max(1, display.scaled(2)))
+
+def init():
+    """
+    Opens the window and loads the settings screen's font and click sound.
+    Only the first call does anything.
+    """
+    global font
+    if font is not None:
+        return
+    display.init()
+    with startup.step("settings"):
+        font = fonts.get_font(None, 36)
+        AnimatedButton.font = font
+        AnimatedButton.click_sound = widgets.click_sound()
+
+# Config key edited by each slider type.
+SLIDER_CONFIG_KEYS = {'click': "volume", 'music': "music_volume"}
 
 # Modify the Slider class so it can update either click sound or music volume.
 class Slider:
@@ -117,18 +52,27 @@ class Slider:
         self.rect = pygame.Rect(x, y, width, height)
         self.min_val = min_val
         self.max_val = max_val
-        self.value = initial
         self.handle_radius = height // 2
-        self.handle_x = x + int((self.value - self.min_val) / (self.max_val - self.min_val) * width)
         self.dragging = False
         self.slider_type = slider_type  # 'click' or 'music'
+        self.config_key = SLIDER_CONFIG_KEYS[slider_type]
+        self.set_value(initial)
+        # Follow changes made elsewhere (e.g. another slider for the same setting).
+        config.store.subscribe(self.config_key, self.set_value)
+
+    def set_value(self, value):
+        self.value = value
+        self.handle_x = self.rect.x + int((self.value - self.min_val) / (self.max_val - self.min_val) * self.rect.width)
+
+    def close(self):
+        config.store.unsubscribe(self.config_key, self.set_value)
 
     def draw(self, surface):
         # Draw slider track.
-        pygame.draw.rect(surface, WHITE, self.rect, 2)
+        pygame.draw.rect(surface, WHITE, display.rect(self.rect), max(1, display.scaled(2)))
         # Draw the handle.
-        handle_center = (self.handle_x, self.rect.centery)
-        pygame.draw.circle(surface, DARK_GRAY, handle_center, self.handle_radius)
+        handle_center = display.point((self.handle_x, self.rect.centery))
+        pygame.draw.circle(surface, DARK_GRAY, handle_center, display.scaled(self.handle_radius))
 
     def update(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -147,68 +91,81 @@ class Slider:
             self.handle_x = max(self.rect.x, min(event.pos[0], self.rect.x + self.rect.width))
             ratio = (self.handle_x - self.rect.x) / self.rect.width
             self.value = self.min_val + ratio * (self.max_val - self.min_val)
-            if self.slider_type == 'click':
-                if button_click_sound:
-                    button_click_sound.set_volume(min(self.value / self.max_val, 1.0))
-                update_config(self.value)
-            elif self.slider_type == 'music':
-                pygame.mixer.music.set_volume(min(self.value / self.max_val, 1.0))
-                update_music_config(self.value)
+            if self.slider_type == 'music':
+                music.player.set_volume(min(self.value / self.max_val, 1.0))
+            # Subscribers (click sounds, a running Game) pick the value up from the
+            # store; the file itself is only written once the drag settles.
+            config.store.set(self.config_key, self.value)
+
+class SettingsScene(Scene):
+    def __init__(self):
+        init()
+        # Read volumes from the config store.
+        initial_click = config.store.get("volume")
+        initial_music = config.store.get("music_volume")
+
+        self.background()  # Loaded now rather than on the first frame.
+
+        # Create UI elements.
+        self.sample_button = AnimatedButton("Test volum", 100, 100, 200, 50,
+                                            lambda: print("Button action executed"))
+        # Click Sound Slider
+        self.click_slider = Slider(100, 200, 300, 20, min_val=0.0, max_val=5.0, initial=initial_click, slider_type='click')
+        # Music Volume Slider (separate)
+        self.music_slider = Slider(100, 300, 300, 20, min_val=0.0, max_val=5.0, initial=initial_music, slider_type='music')
+
+        self.return_button = AnimatedButton("Tilbake", 20, SCREEN_HEIGHT - 60, 150, 50, self.return_to_menu)
+
+    def background(self):
+        return assets.load_image("images/background_chapter.png", display.size((SCREEN_WIDTH, SCREEN_HEIGHT)), owner="settings")
+
+    def return_to_menu(self):
+        self.manager.pop(fade="crossfade")
+
+    def exit(self):
+        self.click_slider.close()
+        self.music_slider.close()
+        self.sample_button.close()
+        self.return_button.close()
 
-def settings_screen():
-    clock = pygame.time.Clock()
-    running = True
-
-    # Read volumes from config files.
-    initial_click = read_config()
-    initial_music = read_music_config()
-
-    background_img = pygame.image.load(resource_path("images/background_chapter.png")).convert()
-    background_img = pygame.transform.scale(background_img, (SCREEN_WIDTH, SCREEN_HEIGHT))
-
-    # Create UI elements.
-    sample_button = AnimatedButton("Test volum", 100, 100, 200, 50,
-                                   lambda: print("Button action executed"))
-    # Click Sound Slider
-    click_slider = Slider(100, 200, 300, 20, min_val=0.0, max_val=5.0, initial=initial_click, slider_type='click')
-    # Music Volume Slider (separate)
-    music_slider = Slider(100, 300, 300, 20, min_val=0.0, max_val=5.0, initial=initial_music, slider_type='music')
-    
-    def return_to_menu():
-        do_fade_transition(lambda: run_menu())
-        nonlocal running
-        running = False
-
-    return_button = AnimatedButton("Tilbake", 20, SCREEN_HEIGHT - 60, 150, 50, return_to_menu)
-
-    while running:
-        clock.tick(60)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            sample_button.handle_event(event)
-            click_slider.update(event)
-            music_slider.update(event)
-            return_button.handle_event(event)
-
-        sample_button.update()
-        return_button.update()
-
-        screen.blit(background_img, (0, 0))
-        sample_button.draw(screen)
-        click_slider.draw(screen)
-        music_slider.draw(screen)
-        return_button.draw(screen)
-
-        click_text = font.render(f"Meny volum: {click_slider.value:.2f}", True, WHITE)
-        music_text = font.render(f"Musikk volum: {music_slider.value:.2f}", True, WHITE)
-        screen.blit(click_text, (100, 230))
-        screen.blit(music_text, (100, 280))
-
-        pygame.display.flip()
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.manager.pop()
+        self.sample_button.handle_event(event)
+        self.click_slider.update(event)
+        self.music_slider.update(event)
+        self.return_button.handle_event(event)
+
+    def update(self, dt):
+        self.sample_button.update()
+        self.return_button.update()
+
+    def is_animating(self):
+        # Stay at full rate while a button is held or a slider dragged, otherwise sleep until input.
+        return (self.sample_button.pressed or self.return_button.pressed or
+                self.click_slider.dragging or self.music_slider.dragging)
+
+    def draw(self, screen):
+        screen.blit(self.background(), display.view)
+        self.sample_button.draw(screen)
+        self.click_slider.draw(screen)
+        self.music_slider.draw(screen)
+        self.return_button.draw(screen)
+
+        # The captions are rendered once; only the value's glyphs are blitted while dragging.
+        text_font = fonts.scaled(font, display.scale)
+        values = fonts.atlas(text_font, WHITE)
+        for caption, slider, y in (("Meny volum: ", self.click_slider, 230),
+                                   ("Musikk volum: ", self.music_slider, 280)):
+            caption_img = fonts.render(caption, text_font, WHITE)
+            x, y = display.point((100, y))
+            screen.blit(caption_img, (x, y))
+            values.draw(screen, f"{slider.value:.2f}", (x + caption_img.get_width(), y))
 
+def settings_screen():
+    # Opened on its own, the settings screen returns to the main menu when closed.
     import menu
-    menu.run_menu()
+    menu.run_menu(SettingsScene())
 
 if __name__ == "__main__":
-    settings_screen()
\ No newline at end of file
+    settings_screen()
@@ -0,0 +1,259 @@
+"""
+Story script compiler.
+
+The story (scenes, dialogue, portraits, backgrounds and decisions) is written
+in data/story.txt; the format is described at the top of that file.
+compile_story() checks it and turns it into a Story: scenes are numbered,
+choices point straight at the scene they lead to and every line already knows
+its speaker, so the game never looks anything up by name while playing.
+
+    python code/story.py [path]     # check a script and print a summary
+"""
+import os
+import sys
+import time
+
+KINDS = ("story", "info", "ending")
+SIDES = ("left", "right")
+
+class StoryError(Exception):
+    """The script has errors; .problems lists every one of them."""
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("\n".join(problems))
+
+class Portrait:
+    """Where a speaker is shown and the images cycled through, one per line they say."""
+    def __init__(self, side, images):
+        self.side = side
+        self.images = images
+
+class Line:
+    def __init__(self, text, speaker=None, portrait=None):
+        """
+        :param text: The line as it is shown, including any "Speaker:" tag.
+        :param speaker: The speaker's name, or None for narration.
+        :param portrait: The speaker's Portrait in this scene, or None.
+        """
+        self.text = text
+        self.speaker = speaker
+        self.portrait = portrait
+
+class Choice:
+    def __init__(self, label, target):
+        """
+        :param label: Button text.
+        :param target: Id of the scene the choice leads to.
+        """
+        self.label = label
+        self.target = target
+
+class StoryScene:
+    def __init__(self, scene_id, name):
+        self.id = scene_id
+        self.name = name
+        self.kind = "story"
+        self.chapter = None     # Title in chapter select, if listed there.
+        self.music = None
+        self.cast = None        # Speaker name -> Portrait.
+        self.lines = []
+        # Background for each line, plus one more for the choices after the last line.
+        self.backgrounds = []
+        self.choices = []
+
+    def images(self):
+        """Every image the scene shows (backgrounds and the portraits of its speakers)."""
+        images = [path for path in dict.fromkeys(self.backgrounds) if path]
+        for speaker in dict.fromkeys(line.speaker for line in self.lines if line.portrait):
+            images += self.cast[speaker].images
+        return images
+
+class Story:
+    def __init__(self, scenes, start, chapters, warnings):
+        self.scenes = scenes        # Indexed by scene id.
+        self.ids = {scene.name: scene.id for scene in scenes}
+        self.start = start
+        self.chapters = chapters    # (scene id, title) in script order.
+        self.warnings = warnings
+
+    def scene(self, name):
+        return self.scenes[self.ids[name]]
+
+    def images(self):
+        return {path for scene in self.scenes for path in scene.images()}
+
+def compile_story(text, asset_root=None, source="story"):
+    """
+    Parses and checks a story script.
+
+    :param text: The script.
+    :param asset_root: Folder that image and sound paths are relative to; None skips the file checks.
+    :param source: Name used in error messages.
+    :return: The compiled Story. Unreachable scenes are reported in Story.warnings.
+    :raises StoryError: Listing every error: bad directives, unknown scenes or casts,
+                        duplicate choice labels, missing files and dead ends.
+    """
+    problems = []
+    casts = {}
+    scenes = []
+    names = {}
+    choice_targets = []     # (scene, label, target name, line number)
+    choice_labels = set()   # (scene id, label) of every choice so far.
+    default_music = None
+    cast_names = {}         # Scene id -> cast name, resolved once all casts are known.
+    backgrounds = {}        # Scene id -> background set by the last @background.
+    cast = None             # Cast being defined.
+    scene = None
+
+    def error(number, message):
+        problems.append(f"{source}:{number}: {message}")
+
+    for number, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not line.startswith("@"):
+            if scene is None:
+                error(number, "dialogue outside a scene")
+                continue
+            scene.lines.append(Line(line))
+            scene.backgrounds.append(backgrounds.get(scene.id))
+            continue
+        directive, _, argument = line[1:].partition(" ")
+        argument = argument.strip()
+        if not argument:
+            error(number, f"@{directive} needs an argument")
+            continue
+        if directive == "cast":
+            if argument in casts:
+                error(number, f"cast {argument!r} is defined twice")
+            cast = casts[argument] = {}
+            scene = None
+        elif directive == "portrait":
+            fields = argument.split()
+            if cast is None or scene is not None:
+                error(number, "@portrait outside a @cast")
+            elif len(fields) < 3 or fields[1] not in SIDES:
+                error(number, "expected @portrait <speaker> <left|right> <image> [<image> ...]")
+            else:
+                cast[fields[0]] = Portrait(fields[1], fields[2:])
+        elif directive == "scene":
+            if argument in names:
+                error(number, f"scene {argument!r} is defined twice")
+            scene = StoryScene(len(scenes), argument)
+            scenes.append(scene)
+            names[argument] = scene
+            cast = None
+        elif scene is None:
+            if directive == "music":
+                default_music = argument
+            else:
+                error(number, f"@{directive} outside a scene")
+        elif directive == "kind":
+            if argument not in KINDS:
+                error(number, f"unknown kind {argument!r} (expected one of {', '.join(KINDS)})")
+            scene.kind = argument
+        elif directive == "chapter":
+            scene.chapter = argument
+        elif directive == "background":
+            backgrounds[scene.id] = argument
+        elif directive == "music":
+            scene.music = argument
+        elif directive == "portraits":
+            cast_names[scene.id] = (argument, number)
+        elif directive == "choice":
+            label, arrow, target = argument.partition("->")
+            if not arrow or not label.strip() or not target.strip():
+                error(number, "expected @choice <label> -> <scene>")
+            elif (scene.id, label.strip()) in choice_labels:
+                # The game shows one button per label, so a second one would never be reachable.
+                error(number, f"scene {scene.name!r} already has a choice {label.strip()!r}")
+            else:
+                choice_labels.add((scene.id, label.strip()))
+                choice_targets.append((scene, label.strip(), target.strip(), number))
+        else:
+            error(number, f"unknown directive @{directive}")
+
+    if not scenes:
+        problems.append(f"{source}: no scenes")
+        raise StoryError(problems)
+
+    # Resolve names into objects and ids.
+    for scene_id, (cast_name, number) in cast_names.items():
+        if cast_name not in casts:
+            error(number, f"unknown cast {cast_name!r}")
+        else:
+            scenes[scene_id].cast = casts[cast_name]
+    for scene, label, target, number in choice_targets:
+        if target not in names:
+            error(number, f"choice {label!r} leads to unknown scene {target!r}")
+        else:
+            scene.choices.append(Choice(label, names[target].id))
+    for scene in scenes:
+        scene.backgrounds.append(backgrounds.get(scene.id))
+        if scene.music is None:
+            scene.music = default_music
+        for line in scene.lines:
+            speaker, colon, _ = line.text.partition(":")
+            if colon and scene.cast and speaker in scene.cast:
+                line.speaker = speaker
+                line.portrait = scene.cast[speaker]
+
+    # Dead ends: a story scene has to offer a way on, info and ending scenes end the game.
+    for scene in scenes:
+        if scene.kind == "story" and not scene.choices:
+            problems.append(f"{source}: scene {scene.name!r} is a dead end (no choices and not an info or ending scene)")
+        if scene.kind != "story" and scene.choices:
+            problems.append(f"{source}: {scene.kind} scene {scene.name!r} has choices; they would never be shown")
+        if scene.kind != "story" and not scene.lines:
+            problems.append(f"{source}: {scene.kind} scene {scene.name!r} has no lines")
+
+    if asset_root is not None:
+        checked = {}
+        for scene in scenes:
+            for path in scene.images() + ([scene.music] if scene.music else []):
+                if path not in checked:
+                    checked[path] = os.path.isfile(os.path.join(asset_root, path))
+                    if not checked[path]:
+                        problems.append(f"{source}: scene {scene.name!r} uses missing file {path}")
+
+    if problems:
+        raise StoryError(problems)
+
+    chapters = [(scene.id, scene.chapter) for scene in scenes if scene.chapter]
+    start = chapters[0][0] if chapters else 0
+    # Unreachable scenes are allowed (e.g. drafts), but worth knowing about.
+    reached = {start} | {scene_id for scene_id, _ in chapters}
+    frontier = list(reached)
+    while frontier:
+        for choice in scenes[frontier.pop()].choices:
+            if choice.target not in reached:
+                reached.add(choice.target)
+                frontier.append(choice.target)
+    warnings = [f"{source}: scene {scene.name!r} cannot be reached from any chapter"
+                for scene in scenes if scene.id not in reached]
+    return Story(scenes, start, chapters, warnings)
+
+def load_story(path, asset_root=None):
+    with open(path, encoding="utf-8") as f:
+        return compile_story(f.read(), asset_root, source=os.path.basename(path))
+
+def main():
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_path, "data", "story.txt")
+    start = time.perf_counter()
+    try:
+        story = load_story(path, base_path)
+    except StoryError as e:
+        for problem in e.problems:
+            print("error:", problem)
+        sys.exit(1)
+    elapsed = (time.perf_counter() - start) * 1000
+    for warning in story.warnings:
+        print("warning:", warning)
+    lines = sum(len(scene.lines) for scene in story.scenes)
+    print(f"{len(story.scenes)} scenes, {lines} lines, {len(story.chapters)} chapters, "
+          f"{len(story.images())} images; compiled in {elapsed:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,168 @@
 import pygame
+import assets
 
-class FadeTransition:
+# Default length (ms) of each phase of a transition.
+DURATION = 400
+# Longest step (ms) a transition advances in one frame, so a frame that stalls
+# (e.g. while the next scene is built) does not skip most of the animation.
+MAX_STEP = 50
+
+# Surfaces shared by every transition (and the ending fade), created once per size.
+_pool = {}
+
+def pooled_surface(name, size, color=None):
+    """
+    Returns the shared surface for name and size, creating it only the first time.
+
+    :param color: Fill for a new surface (overlays are filled once and only change alpha).
+    """
+    key = (name, tuple(size), color)
+    surface = _pool.get(key)
+    if surface is None:
+        surface = _pool[key] = pygame.Surface(size)
+        assets.note_allocation()
+        if color is not None:
+            surface.fill(color)
+    return surface
+
+def pooled_surfaces():
+    """(name, surface) pairs of the pool, for the memory report."""
+    return [(key[0], surface) for key, surface in _pool.items()]
+
+def overlay(size, color=(0, 0, 0)):
+    """A solid color surface to fade over the screen; set its alpha right before blitting it."""
+    return pooled_surface("overlay", size, color)
+
+def snapshot(screen):
+    """Copies what is on screen into the shared snapshot surface and returns it."""
+    surface = pooled_surface("snapshot", screen.get_size())
+    surface.set_alpha(None)
+    surface.blit(screen, (0, 0))
+    return surface
+
+# Easing curves: map the linear progress of a phase (0..1) to the drawn one.
+def linear(t):
+    return t
+
+def ease_in_out(t):
+    return t * t * (3 - 2 * t)
+
+def ease_out(t):
+    return 1 - (1 - t) * (1 - t)
+
+class Transition:
     """
-    A fade transition effect that fades to black then reveals the new scene.
+    A screen transition, timed in milliseconds so it lasts as long at any frame rate.
+
+    It goes through self.phases: "fade_in" covers the old scene, "fade_out"
+    reveals the new one. SceneManager switches scenes once "fade_out" starts,
+    so transitions without a "fade_in" phase switch right away.
     """
-    def __init__(self, screen, speed=5, color=(0, 0, 0)):
+    phases = ("fade_in", "fade_out")
+
+    def __init__(self, screen, duration=DURATION, easing=ease_in_out, color=(0, 0, 0)):
         """
         :param screen: The Pygame display surface.
-        :param speed: The change in alpha per frame.
-        :param color: The color of the fade (default is black).
+        :param duration: Length of each phase in milliseconds.
+        :param easing: Curve applied to each phase's progress.
+        :param color: The color shown between the scenes (default is black).
         """
         self.screen = screen
-        self.speed = speed
+        self.duration = duration
+        self.easing = easing
         self.color = color
-        self.overlay = pygame.Surface((self.screen.get_width(), self.screen.get_height()))
-        self.overlay.fill(self.color)
-        self.alpha = 0
-        self.overlay.set_alpha(self.alpha)
-        self.phase = "fade_in"  # "fade_in" means fading from clear to black, then "fade_out" reveals new scene.
-        self.done = False
+        self.start()
 
     def start(self):
         """Resets the transition."""
-        self.alpha = 0
-        self.overlay.set_alpha(self.alpha)
-        self.phase = "fade_in"
+        self.phase = self.phases[0]
+        self.elapsed = 0
         self.done = False
 
-    def update(self):
-        if self.phase == "fade_in":
-            self.alpha += self.speed
-            if self.alpha >= 255:
-                self.alpha = 255
-                self.phase = "fade_out"
-        elif self.phase == "fade_out":
-            self.alpha -= self.speed
-            if self.alpha <= 0:
-                self.alpha = 0
+    def update(self, dt):
+        """Advances by dt milliseconds."""
+        if self.done:
+            return
+        self.elapsed += min(dt, MAX_STEP)
+        if self.elapsed >= self.duration:
+            index = self.phases.index(self.phase)
+            if index + 1 < len(self.phases):
+                self.phase = self.phases[index + 1]
+                self.elapsed = 0
+            else:
+                self.elapsed = self.duration
                 self.done = True
-        self.overlay.set_alpha(self.alpha)
 
+    def progress(self):
+        """Eased progress through the current phase, 0 to 1."""
+        return self.easing(min(1, self.elapsed / self.duration) if self.duration else 1)
+
+    def draw(self):
+        """Draws the transition over the scene that was just drawn."""
+
+class FadeTransition(Transition):
+    """Fades to a color, then reveals the new scene."""
     def draw(self):
-        """Draws the fade overlay."""
-        self.screen.blit(self.overlay, (0, 0))
\ No newline at end of file
+        t = self.progress()
+        surface = overlay(self.screen.get_size(), self.color)
+        surface.set_alpha(round(255 * (t if self.phase == "fade_in" else 1 - t)))
+        self.screen.blit(surface, (0, 0))
+
+class CrossfadeTransition(Transition):
+    """Fades from a snapshot of the old scene straight into the new one."""
+    phases = ("fade_out",)
+
+    def start(self):
+        super().start()
+        self.snapshot = snapshot(self.screen)
+
+    def draw(self):
+        self.snapshot.set_alpha(round(255 * (1 - self.progress())))
+        self.screen.blit(self.snapshot, (0, 0))
+
+class WipeTransition(Transition):
+    """Uncovers the new scene behind an edge that sweeps across a snapshot of the old one."""
+    phases = ("fade_out",)
+
+    def __init__(self, screen, direction="left", **options):
+        """
+        :param direction: Where the edge moves: "left", "right", "up" or "down".
+        """
+        self.direction = direction
+        super().__init__(screen, **options)
+
+    def start(self):
+        super().start()
+        self.snapshot = snapshot(self.screen)
+
+    def draw(self):
+        width, height = self.screen.get_size()
+        t = self.progress()
+        # The part of the old scene the edge has not passed yet.
+        if self.direction == "left":
+            area = pygame.Rect(0, 0, round(width * (1 - t)), height)
+        elif self.direction == "right":
+            area = pygame.Rect(round(width * t), 0, width, height)
+        elif self.direction == "up":
+            area = pygame.Rect(0, 0, width, round(height * (1 - t)))
+        else:
+            area = pygame.Rect(0, round(height * t), width, height)
+        self.screen.blit(self.snapshot, area.topleft, area)
+
+TRANSITIONS = {
+    "fade": (FadeTransition, {}),
+    "crossfade": (CrossfadeTransition, {}),
+    "wipe_left": (WipeTransition, {"direction": "left"}),
+    "wipe_right": (WipeTransition, {"direction": "right"}),
+    "wipe_up": (WipeTransition, {"direction": "up"}),
+    "wipe_down": (WipeTransition, {"direction": "down"}),
+}
+
+def create(name, screen, **options):
+    """
+    Creates a transition by name (see TRANSITIONS).
+
+    :param options: Passed on to the transition (duration, easing, color).
+    """
+    transition_class, defaults = TRANSITIONS[name]
+    return transition_class(screen, **defaults, **options)
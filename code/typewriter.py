@@ -0,0 +1,124 @@
+import pygame
+import assets
+import fonts
+
+WHITE = (255, 255, 255)
+
+class Typewriter:
+    """
+    Reveals a laid out line of text (see layout.py) over time, one page at a time.
+
+    Each row is rendered once when its page starts; revealing more characters
+    only widens the area of those surfaces that gets blitted, using the row
+    offsets computed by the layout, so nothing is measured while it types.
+    The page's rows stay held in the text cache (see assets.hold) until the
+    next page starts or close() is called.
+    """
+    def __init__(self, font, color=WHITE, chars_per_second=1000 / 30):
+        """
+        :param font: The pygame Font used for the text.
+        :param color: Text color.
+        :param chars_per_second: Reveal speed; the default matches the old 30 ms per character.
+        """
+        self.font = font
+        self.color = color
+        self.chars_per_second = chars_per_second
+        self.keys = []
+        self.start(None)
+
+    def start(self, text_layout):
+        """Starts revealing a TextLayout from its first page; None shows nothing."""
+        self.layout = text_layout
+        self.page = 0
+        self.start_page()
+
+    def start_page(self):
+        self.elapsed = 0
+        self.close()
+        if self.layout is None:
+            self.rows, self.surfaces = [], []
+            self.page_start = self.page_end = self.revealed = self.shown = 0
+            return
+        self.rows = self.layout.pages[self.page]
+        self.surfaces = [fonts.render(row.text, self.font, self.color) if row.text else None
+                         for row in self.rows]
+        self.keys = [fonts.text_key(row.text, self.font, self.color) for row in self.rows if row.text]
+        for key in self.keys:
+            assets.hold(key)
+        self.page_start, self.page_end = self.layout.page_range(self.page)
+        self.revealed = self.shown = self.page_start
+
+    def close(self):
+        """Lets the text cache evict the current page's rows again."""
+        for key in self.keys:
+            assets.release(key)
+        self.keys = []
+
+    def has_next_page(self):
+        return self.layout is not None and self.page + 1 < len(self.layout.pages)
+
+    def next_page(self):
+        """Starts revealing the next page; returns False if this was the last one."""
+        if not self.has_next_page():
+            return False
+        self.page += 1
+        self.start_page()
+        return True
+
+    def seek(self, page, revealed, elapsed):
+        """
+        Jumps to a page part way through, e.g. to resume a saved game.
+
+        :param revealed: Characters of the whole line revealed, as in self.revealed.
+        :param elapsed: Milliseconds the page has been typing for, so it goes on at the same point.
+        """
+        while self.page < page and self.next_page():
+            pass
+        self.elapsed = elapsed
+        self.revealed = max(self.page_start, min(self.page_end, revealed))
+
+    def update(self, dt):
+        """Advances by dt milliseconds, revealing every character that is due (not just one per frame)."""
+        if self.finished():
+            return
+        self.elapsed += dt
+        self.revealed = min(self.page_end,
+                            self.page_start + int(self.elapsed * self.chars_per_second / 1000))
+
+    def skip(self):
+        """Reveals the rest of the page at once."""
+        self.revealed = self.page_end
+
+    def finished(self):
+        """True once the current page is fully shown."""
+        return self.revealed >= self.page_end
+
+    def visible(self, row):
+        """Characters of row that are revealed."""
+        return max(0, min(self.revealed, row.end) - row.start)
+
+    def reveal_rects(self, pos):
+        """
+        Rects of the glyphs revealed since the last call, for a page drawn at pos.
+
+        Starting a page counts as nothing shown yet.
+        """
+        rects = []
+        if self.revealed != self.shown:
+            x, y = pos
+            for row in self.rows:
+                before = max(0, min(self.shown, row.end) - row.start)
+                now = self.visible(row)
+                if before != now:
+                    left, right = sorted((row.offsets[before], row.offsets[now]))
+                    rects.append(pygame.Rect(x + left, y + row.y, right - left, row.height))
+            self.shown = self.revealed
+        return rects
+
+    def draw(self, screen, pos):
+        x, y = pos
+        for row, surface in zip(self.rows, self.surfaces):
+            visible = self.visible(row)
+            if surface is not None and visible > 0:
+                area = pygame.Rect(0, 0, row.offsets[visible], surface.get_height())
+                screen.blit(surface, (x, y + row.y), area)
@@ -0,0 +1,120 @@
+import pygame
+import assets
+import config
+import display
+import fonts
+
+WHITE = (255, 255, 255)
+CLICK_SOUND_PATH = "sound/button_click.wav"
+
+_click_sound = None
+_click_sound_loaded = False
+
+def click_sound():
+    """
+    The button click sound every screen shares, loaded on the first call. Its
+    volume follows the "volume" setting (0.0-5.0, scaled to 0.0-1.0).
+
+    :return: The Sound, or None if it could not be loaded.
+    """
+    global _click_sound, _click_sound_loaded
+    if not _click_sound_loaded:
+        _click_sound_loaded = True
+        try:
+            sound = pygame.mixer.Sound(assets.resource_path(CLICK_SOUND_PATH))
+            sound.set_volume(min(config.store.get("volume") / 5.0, 1.0))
+            config.store.subscribe("volume", lambda value: sound.set_volume(min(value / 5.0, 1.0)))
+            _click_sound = sound
+        except Exception as e:
+            print("Error loading sound:", e)
+    return _click_sound
+
+class AnimatedButton:
+    """
+    A button that moves down while pressed and plays a click sound.
+
+    The scaled skin and the rendered label are built once and reused every
+    frame; they are only rebuilt when the button's size, text or font changes,
+    or the window's resolution does. The button holds both in their caches
+    (see assets.hold) until close(), which screens call when they drop it.
+    rect is in logical coordinates (see display.py).
+    Modules configure their buttons by subclassing and setting the class
+    attributes below (font and click_sound from their init(), once pygame is up).
+    """
+    font = None
+    text_color = WHITE
+    skin_path = "images/button_box.png"
+    smooth = False      # Use smoothscale for the skin.
+    click_sound = None
+    owner = None        # Who the skins are loaded for, for the memory report.
+
+    def __init__(self, text, x, y, width, height, action):
+        self.text = text
+        self.base_rect = pygame.Rect(x, y, width, height)
+        self.rect = self.base_rect.copy()
+        self.action = action
+        self.hovered = False
+        self.pressed = False
+        self.press_offset = 5  # How many pixels to move down when pressed
+        self._skin = None
+        self._skin_key = None
+        self._label = None
+        self._label_key = None
+
+    def skin(self):
+        """Returns the cached skin for the current size (shared with other buttons of that size)."""
+        key = assets.image_key(self.skin_path, display.size(self.rect.size), alpha=True, smooth=self.smooth)
+        if key != self._skin_key:
+            self._skin = assets.load_image(self.skin_path, key[1], alpha=True, smooth=self.smooth, owner=self.owner)
+            self._hold("_skin_key", key)
+        return self._skin
+
+    def label(self):
+        """Returns the cached label surface, re-rendering it only when text, font or color change."""
+        key = fonts.text_key(self.text, fonts.scaled(self.font, display.scale), self.text_color)
+        if key != self._label_key:
+            self._label = fonts.render(*key)
+            self._hold("_label_key", key)
+        return self._label
+
+    def _hold(self, attribute, key):
+        if getattr(self, attribute) is not None:
+            assets.release(getattr(self, attribute))
+        assets.hold(key)
+        setattr(self, attribute, key)
+
+    def close(self):
+        """Lets the caches evict the skin and label again."""
+        for attribute in ("_skin_key", "_label_key"):
+            if getattr(self, attribute) is not None:
+                assets.release(getattr(self, attribute))
+                setattr(self, attribute, None)
+        self._skin = self._label = None
+
+    def draw_skin(self, screen):
+        screen.blit(self.skin(), display.point(self.rect.topleft))
+
+    def draw(self, screen):
+        # The pressed look is the same cached skin and label drawn at the
+        # offset rect, so pressing a button never builds new surfaces.
+        self.draw_skin(screen)
+        label = self.label()
+        screen.blit(label, label.get_rect(center=display.point(self.rect.center)))
+
+    def update(self):
+        if self.pressed:
+            self.rect.y = self.base_rect.y + self.press_offset
+        else:
+            self.rect.y = self.base_rect.y
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.rect.collidepoint(event.pos):
+                self.pressed = True
+                if self.click_sound:
+                    self.click_sound.play()
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if self.pressed:
+                self.pressed = False
+                if self.rect.collidepoint(event.pos):
+                    self.action()